@@ -108,12 +108,11 @@ def classify_and_store(pdf_file: Path, classifier: ImprovedPDFClassifier, base_d
     import fitz
     import re
     try:
-        doc = fitz.open(str(pdf_file))
-        text = ''
-        for i in range(min(2, len(doc))):
-            text += doc[i].get_text()
-        doc.close()
-        report_type = classifier.classify_pdf(str(pdf_file))
+        # Extract the first 2 pages once; classification and the
+        # pharmacy/date sniffing all work off the same text
+        with fitz.open(str(pdf_file)) as doc:
+            text = ''.join(doc[i].get_text() for i in range(min(2, len(doc))))
+        report_type = classifier.classify_pdf(text)
         pharmacy_name = classifier.extract_pharmacy_name(text)
         date_str = classifier.extract_date(text)
         if not date_str:
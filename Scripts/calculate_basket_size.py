@@ -1,4 +1,5 @@
 import json
+import os
 from pathlib import Path
 from typing import Dict, Any
 
@@ -134,5 +135,53 @@ def calculate_basket_size():
     
     return basket_size_results
 
+def apply_basket_sizes_to_database(basket_size_results: list) -> bool:
+    """
+    Write the calculated basket metrics to daily_summary in one batched round
+
+    Resolves every pharmacy_id with a single SELECT up front and sends the
+    row updates through execute_batch, instead of running a pharmacies
+    subquery inside every UPDATE.
+    """
+    if not basket_size_results:
+        return False
+
+    from psycopg2.extras import execute_batch
+    from render_database_connection import RenderPharmacyDatabase
+
+    db = RenderPharmacyDatabase()
+    try:
+        with db.conn.cursor() as cursor:
+            cursor.execute("SELECT pharmacy_code, id FROM pharmacies")
+            pharmacy_map = dict(cursor.fetchall())
+
+            params = [
+                (result['avg_basket_size'], result['transactions_total'],
+                 result['turnover'], result['avg_basket_value'],
+                 pharmacy_map[result['pharmacy']], result['date'])
+                for result in basket_size_results
+                if result['pharmacy'] in pharmacy_map
+            ]
+            execute_batch(cursor, """
+                UPDATE daily_summary SET
+                    avg_basket_size = %s,
+                    transactions_total = %s,
+                    turnover = %s,
+                    avg_basket_value = %s
+                WHERE pharmacy_id = %s AND report_date = %s
+            """, params, page_size=500)
+
+        db.conn.commit()
+        print(f"✅ Updated {len(params)} daily_summary rows with basket sizes")
+        return True
+    except Exception as e:
+        db.conn.rollback()
+        print(f"❌ Failed to update daily_summary with basket sizes: {e}")
+        return False
+    finally:
+        db.close()
+
 if __name__ == "__main__":
-    calculate_basket_size() 
\ No newline at end of file
+    results = calculate_basket_size()
+    if results and os.getenv('DATABASE_URL'):
+        apply_basket_sizes_to_database(results)
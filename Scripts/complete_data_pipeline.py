@@ -257,6 +257,13 @@ def run_complete_pipeline(classified_pdfs_dir="temp_classified_pdfs"):
     # Define the base directory for classified PDFs
     base_dir = Path(classified_pdfs_dir)
 
+    # The extractors memoize the classified-tree walk for the life of
+    # the process, but the email monitor deletes and re-creates that
+    # tree between in-process runs - start every run from a fresh walk
+    # so no extractor sees paths from a previous cycle
+    from report_common import list_reports
+    list_reports.cache_clear()
+
     print("\n" + "="*80)
     print("🚀 STARTING COMPLETE DATA PIPELINE")
     print("="*80)
@@ -15,8 +15,11 @@ from pathlib import Path
 
 def connect_gmail():
     """Connect to Gmail IMAP"""
-    gmail_user = 'dmr.tlc.reitz@gmail.com'
-    gmail_password = 'dkcj ixgf vhkf jupx'
+    gmail_user = os.getenv('REITZ_GMAIL_USERNAME', 'dmr.tlc.reitz@gmail.com')
+    gmail_password = os.getenv('REITZ_GMAIL_APP_PASSWORD')
+    if not gmail_password:
+        print("❌ REITZ_GMAIL_APP_PASSWORD environment variable not set")
+        return None
     imap_server = 'imap.gmail.com'
     
     try:
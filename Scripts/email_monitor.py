@@ -9,10 +9,15 @@ and cleans up the emails after successful processing.
 """
 
 import os
+import re
 import time
+import base64
 import email
+import email.errors
+import email.message
 import imaplib
 import smtplib
+import signal
 import logging
 import tempfile
 import shutil
@@ -22,9 +27,23 @@ from email.mime.base import MIMEBase
 from email import encoders
 from pathlib import Path
 from datetime import datetime, timedelta
+from dataclasses import dataclass
 import json
 import threading
+
+# C-accelerated JSON when available; both expose loads(bytes)
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
+from dotenv import load_dotenv
+
+# Pull credentials from .env once at import; nothing below embeds secrets
+load_dotenv()
 
 # Import our existing modules
 from extract_trading_summary import extract_trading_summary_data
@@ -45,11 +64,125 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Messages per batched FETCH command; larger batches give no further
+# round-trip savings and risk oversized IMAP requests
+FETCH_BATCH_SIZE = 100
+
+# Gmail drops IDLE sessions after ~10 minutes; re-issue before that
+IDLE_TIMEOUT_SECONDS = 540
+
+# Pulls the UID out of a FETCH response prefix
+_UID_RE = re.compile(rb'UID (\d+)')
+
+# Quoted timestamp inside an INTERNALDATE item, e.g. "05-Aug-2025 09:51:22 +0200"
+_INTERNALDATE_RE = re.compile(rb'INTERNALDATE "([^"]+)"')
+
+# PDF metadata dates look like D:YYYYMMDDHHmmSS...
+_PDF_META_DATE_RE = re.compile(r'D:(\d{4})(\d{2})(\d{2})')
+
+# Loose test for a PDF part inside a raw BODYSTRUCTURE response: either an
+# APPLICATION/PDF content type or a part filename ending in .pdf. False
+# positives are fine — the parsed MIME tree is the final arbiter.
+_BODYSTRUCTURE_PDF_RE = re.compile(rb'"PDF"|\.pdf"', re.IGNORECASE)
+
+# Classified PDF filenames: <report_type>_<HHMM>_originalname.pdf
+_CLASSIFIED_NAME_RE = re.compile(r'([a-z_]+)_(\d{4})_.*\.pdf$')
+
+# Chunked base64 decode: strip line breaks, decode in 64KB windows
+# (multiple of 4, so every window is a valid base64 quantum)
+_B64_STRIP = str.maketrans('', '', '\r\n')
+_B64_WINDOW = 64 * 1024
+
+# All PDF report date shapes fused into one union so a page is scanned
+# once instead of once per pattern. Alternatives are ordered
+# most-specific-first; each branch names the Y/M/D groups it captures.
+_PDF_DATE_UNION_RE = re.compile(
+    # DATE FROM : 2025/08/05 DATE TO : 2025/08/05 (use the TO date)
+    r'DATE FROM\s*:\s*\d{4}/\d{1,2}/\d{1,2}\s+DATE TO\s*:\s*(?P<to_y>\d{4})/(?P<to_m>\d{1,2})/(?P<to_d>\d{1,2})'
+    # 05/08/2025 - 05/08/2025 (use the end date)
+    r'|\d{1,2}/\d{1,2}/\d{4}\s*-\s*(?P<rd_d>\d{1,2})/(?P<rd_m>\d{1,2})/(?P<rd_y>\d{4})'
+    # Report Date : 2025-08-05
+    r'|Report Date\s*:\s*(?P<rp_y>\d{4})-(?P<rp_m>\d{1,2})-(?P<rp_d>\d{1,2})'
+    # Date : 05/08/2025
+    r'|Date\s*:\s*(?P<lb_d>\d{1,2})/(?P<lb_m>\d{1,2})/(?P<lb_y>\d{4})'
+    # Any 2025/08/05 pattern
+    r'|(?P<by_y>\d{4})/(?P<by_m>\d{1,2})/(?P<by_d>\d{1,2})'
+    # Any 05/08/2025 pattern
+    r'|(?P<bd_d>\d{1,2})/(?P<bd_m>\d{1,2})/(?P<bd_y>\d{4})'
+)
+
+# Map a match's lastgroup (the final group captured by its branch) to the
+# branch's Y/M/D group names; iteration order doubles as branch priority
+_PDF_DATE_BRANCHES = {
+    'to_d': ('to_y', 'to_m', 'to_d'),
+    'rd_y': ('rd_y', 'rd_m', 'rd_d'),
+    'rp_d': ('rp_y', 'rp_m', 'rp_d'),
+    'lb_y': ('lb_y', 'lb_m', 'lb_d'),
+    'by_d': ('by_y', 'by_m', 'by_d'),
+    'bd_y': ('bd_y', 'bd_m', 'bd_d'),
+}
+
+# Flat (section, ((output column, source key), ...)) map that drives
+# prepare_data_for_insertion — one place to touch when columns are added,
+# and a ready-made row shape for bulk insertion
+_INSERT_SCHEMA = (
+    ('trading_summary', (
+        ('stock_opening', 'stock_opening'),
+        ('stock_closing', 'stock_closing'),
+        ('purchases', 'purchases'),
+        ('adjustments', 'adjustments'),
+        ('cost_of_sales', 'cost_of_sales'),
+        ('gp_value', 'gp_value'),
+        ('gp_percent', 'gp_percent'),
+    )),
+    ('turnover_summary', (
+        ('turnover', 'turnover'),
+        ('sales_cash', 'sales_cash'),
+        ('sales_account', 'sales_account'),
+        ('sales_cod', 'sales_cod'),
+    )),
+    ('transaction_summary', (
+        ('transactions_total', 'transactions_total'),
+        ('avg_basket_value', 'avg_basket_value'),
+    )),
+    ('dispensary_summary', (
+        ('script_total', 'script_total'),
+        ('disp_turnover', 'disp_turnover'),
+        ('avg_script_value', 'avg_script_value'),
+    )),
+)
+
+# Filename date patterns; the flag says whether group 1 is the year
+_FILENAME_DATE_PATTERNS = (
+    (re.compile(r'(\d{4})(\d{2})(\d{2})-\d{2}h\d{2}m\d{2}s'), True),   # 20250805-09h51m22s
+    (re.compile(r'(\d{4})-(\d{2})-(\d{2})'), True),                    # 2025-08-05
+    (re.compile(r'(\d{2})(\d{2})(\d{4})'), False),                     # 05082025
+)
+
+@dataclass(slots=True)
+class EmailRecord:
+    """Fixed-shape record for one fetched email.
+
+    A slotted dataclass instead of a dict: much smaller per instance and
+    attribute access skips the hash lookup in the hot per-email loops.
+    """
+    id: str
+    subject: str
+    sender: str
+    date: str
+    timestamp: datetime
+    message: email.message.Message
+    pdf_parts: List[email.message.Message]
+
 class PharmacyEmailMonitor:
     def __init__(self):
         """Initialize the email monitor with Gmail credentials"""
         self.gmail_user = os.getenv('REITZ_GMAIL_USERNAME', 'dmr.tlc.reitz@gmail.com')
-        self.gmail_password = os.getenv('REITZ_GMAIL_APP_PASSWORD', 'dkcj ixgf vhkf jupx')
+        self.gmail_password = os.getenv('REITZ_GMAIL_APP_PASSWORD')
+        if not self.gmail_password:
+            # Fail fast here rather than deep inside connect_imap, where a
+            # missing credential surfaces as a confusing login error
+            raise ValueError("REITZ_GMAIL_APP_PASSWORD environment variable not set")
         self.imap_server = 'imap.gmail.com'
         self.smtp_server = 'smtp.gmail.com'
         self.smtp_port = 587
@@ -57,7 +190,42 @@ class PharmacyEmailMonitor:
         # Email processing settings
         self.temp_dir = Path('temp_email_pdfs')
         self.temp_dir.mkdir(exist_ok=True)
+
+        # Stop flag for the monitoring loop; SIGTERM sets it so the wait
+        # between cycles can be interrupted instead of sleeping it out
+        self._stop = threading.Event()
+        try:
+            signal.signal(signal.SIGTERM, lambda *_: self._stop.set())
+        except ValueError:
+            # Not running on the main thread (e.g. under the web service);
+            # signal handling stays with the host process
+            pass
         
+        # Single-worker pool so file cleanup runs off the cycle's critical
+        # path; one worker keeps deletions serialized, and the lock guards
+        # against a direct cleanup call racing a queued one
+        self._cleanup_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='cleanup')
+        self._cleanup_lock = threading.Lock()
+        self._cleanup_future = None
+
+        # Pool for attachment decode+write; base64 decode and disk writes
+        # both release the GIL, so attachments land in parallel while the
+        # fetch loop is still waiting on the network
+        self._attachment_pool = ThreadPoolExecutor(
+            max_workers=os.cpu_count() or 4, thread_name_prefix='attach'
+        )
+        self._pending_saves = []
+
+        # Highest UID already processed; each cycle only examines mail
+        # newer than this instead of re-fetching the whole 2-day window
+        self.uid_cache_path = Path('last_uid.txt')
+        self.last_uid = self._load_last_uid()
+        self._cycle_max_uid = 0
+
+        # Persistent IMAP connection, established lazily and reused
+        # across cycles; reconnects only when the server drops it
+        self._mail = None
+
         # Database connection
         self.db = None
         self.connect_database()
@@ -82,10 +250,74 @@ class PharmacyEmailMonitor:
         except Exception as e:
             logger.error(f"Failed to connect to Gmail IMAP: {e}")
             return None
+
+    def _get_mail(self):
+        """Return the persistent IMAP connection, reconnecting if it died.
+
+        A NOOP doubles as health check and keep-alive, so the TLS
+        handshake + LOGIN happens once per connection lifetime instead of
+        once per 10-minute cycle (Gmail throttles frequent reconnects).
+        """
+        if self._mail is not None:
+            try:
+                self._mail.noop()
+                return self._mail
+            except (imaplib.IMAP4.error, OSError):
+                logger.warning("IMAP connection dropped; reconnecting")
+                self._discard_mail()
+        self._mail = self.connect_imap()
+        return self._mail
+
+    def _discard_mail(self):
+        """Drop the persistent IMAP connection, ignoring logout errors."""
+        if self._mail is not None:
+            try:
+                self._mail.logout()
+            except Exception:
+                pass
+            self._mail = None
     
-    def get_recent_emails(self, mail, days: int = 2) -> List[Dict]:
+    def _load_last_uid(self) -> int:
+        """Read the persisted high-water UID, or 0 on first run."""
+        try:
+            return int(self.uid_cache_path.read_text().strip())
+        except (OSError, ValueError):
+            return 0
+
+    def _commit_last_uid(self, uid: int):
+        """Atomically persist the highest processed UID (tmp + rename)."""
+        tmp = self.uid_cache_path.with_suffix('.tmp')
+        tmp.write_text(str(uid))
+        os.replace(tmp, self.uid_cache_path)
+
+    def _advance_last_uid(self):
+        """Move the high-water mark up to the largest UID seen this cycle."""
+        if self._cycle_max_uid > self.last_uid:
+            self.last_uid = self._cycle_max_uid
+            self._commit_last_uid(self.last_uid)
+
+    @staticmethod
+    def _parse_internaldate(raw: bytes) -> Optional[datetime]:
+        """Parse an INTERNALDATE out of a FETCH response.
+
+        Parses the server's timestamp with its own zone offset and converts
+        to naive local time directly, instead of the old
+        Internaldate2tuple + time.mktime round-trip through libc's localtime
+        (which silently misplaced timestamps across DST transitions).
+        """
+        m = _INTERNALDATE_RE.search(raw)
+        if not m:
+            return None
+        try:
+            stamp = datetime.strptime(m.group(1).decode().lstrip(), '%d-%b-%Y %H:%M:%S %z')
+            return stamp.astimezone().replace(tzinfo=None)
+        except ValueError:
+            return None
+
+    def get_recent_emails(self, mail, days: int = 2) -> List[EmailRecord]:
         """Get emails from the last N days with PDF attachments"""
         recent_emails = []
+        self._pending_saves = []
         
         try:
             # Select inbox
@@ -95,73 +327,135 @@ class PharmacyEmailMonitor:
             cutoff_date = datetime.now() - timedelta(days=days)
             date_str = cutoff_date.strftime('%d-%b-%Y')
             
-            # Search for emails since cutoff date
-            status, messages = mail.search(None, f'SINCE {date_str}')
+            # Search for emails since cutoff date, skipping everything at
+            # or below the persisted high-water UID. An IMAP quirk: a UID
+            # range ending in * always matches the newest message even when
+            # its UID is below the lower bound, hence the int filter below.
+            status, messages = mail.uid(
+                'SEARCH', None, f'SINCE {date_str} UID {self.last_uid + 1}:*'
+            )
             
             if status != 'OK':
                 logger.error("Failed to search emails")
                 return recent_emails
             
-            email_ids = messages[0].split()
-            
-            for email_id in email_ids:
-                try:
-                    # Fetch email
-                    status, msg_data = mail.fetch(email_id, '(RFC822)')
-                    
-                    if status != 'OK':
+            email_ids = [u for u in messages[0].split() if int(u) > self.last_uid]
+
+            # Phase 1: cheap metadata sweep. INTERNALDATE and BODYSTRUCTURE
+            # cost a few hundred bytes per message, so every message in the
+            # window can be classified without downloading a single body.
+            pdf_candidates = []  # (uid, internaldate timestamp or None)
+            seen_uids = []    # every UID swept in phase 1
+            failed_uids = []  # PDF candidates whose body fetch failed
+            for start in range(0, len(email_ids), FETCH_BATCH_SIZE):
+                chunk = email_ids[start:start + FETCH_BATCH_SIZE]
+                id_set = b','.join(chunk).decode()
+                status, meta_data = mail.uid('FETCH', id_set, '(INTERNALDATE BODYSTRUCTURE)')
+
+                if status != 'OK':
+                    logger.error("Metadata FETCH failed for messages %s", id_set)
+                    continue
+
+                for item in meta_data:
+                    raw = item[0] if isinstance(item, tuple) else item
+                    if not raw or raw == b')':
                         continue
-                    
-                    email_body = msg_data[0][1]
-                    email_message = email.message_from_bytes(email_body)
-                    
-                    # Determine a reliable timestamp for this email
-                    try:
-                        # Prefer the server-side INTERNALDATE (timezone-safe and monotonic)
-                        status_int, int_data = mail.fetch(email_id, '(INTERNALDATE)')
-                        if status_int == 'OK' and int_data:
-                            raw = int_data[0][0] if isinstance(int_data[0], tuple) else int_data[0]
-                            internal_ts = imaplib.Internaldate2tuple(raw)
-                            email_timestamp = datetime.fromtimestamp(time.mktime(internal_ts))
-                        else:
-                            raise ValueError("INTERNALDATE not available")
-                    except Exception as e:
-                        # Fallback to parsing the Date: header or use current time
-                        email_timestamp = datetime.now()
-                        date_hdr = email_message.get('Date', '')
-                        if date_hdr:
-                            try:
-                                date_str_clean = date_hdr.split(' (')[0].split(' +')[0]
-                                email_timestamp = datetime.strptime(date_str_clean, '%a, %d %b %Y %H:%M:%S')
-                            except Exception:
-                                logger.warning(f"Could not parse email Date header '{date_hdr}'")
-                    
-                    # Check if email has PDF attachments
-                    has_pdf = False
-                    for part in email_message.walk():
-                        if part.get_content_maintype() == 'multipart':
-                            continue
-                        if part.get('Content-Disposition') is None:
-                            continue
-                        
-                        filename = part.get_filename()
-                        if filename and filename.lower().endswith('.pdf'):
-                            has_pdf = True
-                            break
-                    
-                    if has_pdf:
-                        recent_emails.append({
-                            'id': email_id.decode(),
-                            'subject': email_message.get('Subject', 'No Subject'),
-                            'from': email_message.get('From', 'Unknown'),
-                            'date': email_message.get('Date', 'Unknown'),
-                            'timestamp': email_timestamp,
-                            'message': email_message
-                        })
-                
-                except Exception as e:
+
+                    uid_match = _UID_RE.search(raw)
+                    if not uid_match:
+                        continue
+                    seen_uids.append(int(uid_match.group(1)))
+
+                    # Only messages whose BODYSTRUCTURE advertises a PDF part
+                    # are worth a full download
+                    if not _BODYSTRUCTURE_PDF_RE.search(raw):
+                        continue
+
+                    pdf_candidates.append((uid_match.group(1), self._parse_internaldate(raw)))
+
+            # Phase 2: full download, but only for the PDF candidates — for
+            # N messages with M carrying PDFs, bytes over the wire drop by
+            # the size of all N-M non-PDF bodies.
+            for start in range(0, len(pdf_candidates), FETCH_BATCH_SIZE):
+                chunk = pdf_candidates[start:start + FETCH_BATCH_SIZE]
+                ts_by_uid = dict(chunk)
+                id_set = b','.join(uid for uid, _ in chunk).decode()
+                status, msg_data = mail.uid('FETCH', id_set, '(RFC822)')
+
+                if status != 'OK':
+                    logger.error("Batched FETCH failed for messages %s", id_set)
+                    failed_uids.extend(int(uid) for uid, _ in chunk)
                     continue
-            
+
+                for item in msg_data:
+                    # Literal responses come back as (prefix, body) tuples
+                    # interleaved with bare b')' terminators — skip the latter
+                    if not isinstance(item, tuple):
+                        continue
+
+                    prefix, email_body = item[0], item[1]
+                    uid_match = _UID_RE.search(prefix)
+                    email_id = uid_match.group(1) if uid_match else prefix.split(b' ', 1)[0]
+                    try:
+                        email_message = email.message_from_bytes(email_body)
+
+                        # INTERNALDATE was captured during the metadata sweep
+                        email_timestamp = ts_by_uid.get(email_id)
+                        if email_timestamp is None:
+                            # Fallback to parsing the Date: header or use current time
+                            email_timestamp = datetime.now()
+                            date_hdr = email_message.get('Date', '')
+                            if date_hdr:
+                                try:
+                                    date_str_clean = date_hdr.split(' (')[0].split(' +')[0]
+                                    email_timestamp = datetime.strptime(date_str_clean, '%a, %d %b %Y %H:%M:%S')
+                                except Exception:
+                                    logger.warning("Could not parse email Date header '%s'", date_hdr)
+
+                        # Confirm against the parsed MIME tree (BODYSTRUCTURE
+                        # matching is deliberately loose) and keep the PDF
+                        # parts, so extraction never has to walk the tree again
+                        pdf_parts = [
+                            part for part in email_message.walk()
+                            if part.get_content_maintype() != 'multipart'
+                            and part.get('Content-Disposition') is not None
+                            and (part.get_filename() or '').lower().endswith('.pdf')
+                        ]
+
+                        if pdf_parts:
+                            record = EmailRecord(
+                                id=email_id.decode(),
+                                subject=email_message.get('Subject', 'No Subject'),
+                                sender=email_message.get('From', 'Unknown'),
+                                date=email_message.get('Date', 'Unknown'),
+                                timestamp=email_timestamp,
+                                message=email_message,
+                                pdf_parts=pdf_parts
+                            )
+                            recent_emails.append(record)
+                            # Start decode+write immediately so disk/CPU work
+                            # overlaps the network wait for the next batch
+                            self._queue_attachment_saves(record)
+
+                    except (imaplib.IMAP4.error, email.errors.MessageError, OSError, ValueError) as e:
+                        # Skip malformed/unfetchable messages without paying for a
+                        # traceback in the common path; keep full detail at DEBUG.
+                        logger.error("Skipping email %s: %s", email_id, e, exc_info=False)
+                        logger.debug("Email processing failure detail", exc_info=True)
+                        continue
+
+            # Advance the cycle's high-water mark only up to (never past)
+            # the lowest PDF candidate whose body fetch failed: the mark is
+            # a single scalar, so skipping over a failed message would mean
+            # its reports are never re-fetched. With no fetch failures the
+            # mark covers everything swept in phase 1. Messages that
+            # fetched but failed to parse are advanced past - they are
+            # malformed, and retrying them forever would wedge the monitor.
+            cap = min(failed_uids) if failed_uids else None
+            for uid in seen_uids:
+                if cap is None or uid < cap:
+                    self._cycle_max_uid = max(self._cycle_max_uid, uid)
+
             return recent_emails
             
         except Exception as e:
@@ -171,133 +465,121 @@ class PharmacyEmailMonitor:
     def extract_report_date_from_pdf(self, pdf_path: Path) -> Optional[str]:
         """Extract report date from PDF content"""
         try:
-            # First try to extract from filename (as fallback)
+            # Fast path: report filenames normally carry the date
+            # (e.g. 20250805-09h51m22s-Complete.pdf), so a filename hit means
+            # the PDF never has to be opened and parsed at all.
             filename = pdf_path.name
             filename_date = self.extract_date_from_filename(filename)
-            
-            import fitz  # PyMuPDF
-            doc = fitz.open(pdf_path)
-            text = ""
-            for page in doc:
-                text += page.get_text()
-            doc.close()
-            
-            # Date patterns to match (more comprehensive)
-            import re
-            date_patterns = [
-                # DATE FROM : 2025/08/05 DATE TO : 2025/08/05
-                r'DATE FROM\s*:\s*(\d{4})/(\d{1,2})/(\d{1,2})\s+DATE TO\s*:\s*(\d{4})/(\d{1,2})/(\d{1,2})',
-                # 05/08/2025 - 05/08/2025
-                r'(\d{1,2})/(\d{1,2})/(\d{4})\s*-\s*(\d{1,2})/(\d{1,2})/(\d{4})',
-                # Report Date : 2025-08-05
-                r'Report Date\s*:\s*(\d{4})-(\d{1,2})-(\d{1,2})',
-                # Date : 05/08/2025
-                r'Date\s*:\s*(\d{1,2})/(\d{1,2})/(\d{4})',
-                # Any 2025/08/05 pattern
-                r'(\d{4})/(\d{1,2})/(\d{1,2})',
-                # Any 05/08/2025 pattern
-                r'(\d{1,2})/(\d{1,2})/(\d{4})'
-            ]
-            
-            for pattern in date_patterns:
-                matches = re.findall(pattern, text)
-                if matches:
-                    # Use the last match found (likely the most recent/relevant)
-                    match = matches[-1]
-                    
-                    if 'DATE TO' in pattern:
-                        # Use the "TO" date (end date)
-                        year, month, day = match[3], match[4], match[5]
-                    elif len(match) == 6:
-                        # Date range, use end date
-                        day, month, year = match[3], match[4], match[5]
-                    elif len(match) == 3:
-                        if len(match[0]) == 4:
-                            # YYYY/MM/DD format
-                            year, month, day = match[0], match[1], match[2]
-                        else:
-                            # DD/MM/YYYY format
-                            day, month, year = match[0], match[1], match[2]
-                    
-                    # Format as YYYY-MM-DD
-                    extracted_date = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-                    logger.info(f"Extracted date {extracted_date} from PDF content")
-                    return extracted_date
-            
-            # If no date found in PDF content, use filename date
             if filename_date:
-                logger.info(f"Using filename date {filename_date} as fallback")
+                logger.info("Extracted date %s from filename", filename_date)
                 return filename_date
-            
+
+            import fitz  # PyMuPDF
+            # Stream page by page and stop at the first page that yields a
+            # date — reports carry it in the page-1 header, so the rest of
+            # the document usually never gets text-extracted at all.
+            # sort=False skips PyMuPDF's block-sorting pass, which date
+            # matching doesn't need.
+            with fitz.open(pdf_path) as doc:
+                # Second fast path: generated reports usually stamp their
+                # date into the PDF metadata, which costs no text extraction
+                meta = doc.metadata or {}
+                for meta_key in ('creationDate', 'modDate'):
+                    m = _PDF_META_DATE_RE.search(meta.get(meta_key) or '')
+                    if m:
+                        extracted_date = f"{m.group(1)}-{m.group(2)}-{m.group(3)}"
+                        logger.info("Extracted date %s from PDF metadata", extracted_date)
+                        return extracted_date
+
+                for page in doc:
+                    text = page.get_text("text", sort=False)
+                    extracted_date = self._match_report_date(text)
+                    if extracted_date:
+                        logger.info("Extracted date %s from PDF content", extracted_date)
+                        return extracted_date
+
             return None
         except Exception as e:
-            logger.error(f"Error extracting date from {pdf_path}: {e}")
+            logger.error("Error extracting date from %s: %s", pdf_path, e)
             # Try filename as last resort
             filename = pdf_path.name
             return self.extract_date_from_filename(filename)
     
+    def _match_report_date(self, text: str) -> Optional[str]:
+        """Run the combined date pattern over one page of text."""
+        # Single linear scan; remember the last match per branch so the
+        # old "last match of the highest-priority pattern" behaviour holds
+        last_by_branch = {}
+        for m in _PDF_DATE_UNION_RE.finditer(text):
+            last_by_branch[m.lastgroup] = m
+
+        for branch, (gy, gm, gd) in _PDF_DATE_BRANCHES.items():
+            m = last_by_branch.get(branch)
+            if m:
+                year, month, day = m.group(gy), m.group(gm), m.group(gd)
+                # Format as YYYY-MM-DD
+                return f"{year}-{month.zfill(2)}-{day.zfill(2)}"
+
+        return None
+
     def extract_date_from_filename(self, filename: str) -> Optional[str]:
         """Extract date from filename as fallback"""
         try:
-            import re
             # Look for date patterns in filename like 20250805-09h51m22s-Complete.pdf
-            patterns = [
-                r'(\d{4})(\d{2})(\d{2})-\d{2}h\d{2}m\d{2}s',  # 20250805-09h51m22s
-                r'(\d{4})-(\d{2})-(\d{2})',  # 2025-08-05
-                r'(\d{2})(\d{2})(\d{4})',    # 05082025
-            ]
-            
-            for pattern in patterns:
-                match = re.search(pattern, filename)
+            for pattern, year_first in _FILENAME_DATE_PATTERNS:
+                match = pattern.search(filename)
                 if match:
-                    if len(match.group(1)) == 4:
+                    if year_first:
                         # YYYYMMDD or YYYY-MM-DD
                         year, month, day = match.group(1), match.group(2), match.group(3)
                     else:
                         # DDMMYYYY
                         day, month, year = match.group(1), match.group(2), match.group(3)
-                    
+
                     return f"{year}-{month.zfill(2)}-{day.zfill(2)}"
             
             return None
         except Exception as e:
-            logger.error(f"Error extracting date from filename {filename}: {e}")
+            logger.error("Error extracting date from filename %s: %s", filename, e)
             return None
     
-    def extract_pdf_attachments(self, email_message, email_id: str) -> List[Path]:
-        """Extract PDF attachments from email"""
+    def _save_attachment(self, part, filepath: Path) -> Path:
+        """Decode one attachment part and write it to disk."""
+        encoding = (part.get('Content-Transfer-Encoding') or '').strip().lower()
+        with open(filepath, 'wb', buffering=1 << 20) as f:
+            if encoding == 'base64':
+                # Stream the decode in 4-char-aligned windows straight into
+                # the buffered file, so peak memory per attachment is one
+                # window instead of the whole decoded PDF on top of the
+                # already-held encoded text
+                raw = part.get_payload(decode=False).translate(_B64_STRIP)
+                for i in range(0, len(raw), _B64_WINDOW):
+                    f.write(base64.b64decode(raw[i:i + _B64_WINDOW]))
+            else:
+                f.write(part.get_payload(decode=True))
+        logger.info("Extracted PDF: %s -> %s", filepath.name, filepath)
+        return filepath
+
+    def _queue_attachment_saves(self, record: EmailRecord):
+        """Submit one email's PDF parts for decode+write on the pool."""
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        for part in record.pdf_parts:
+            filepath = self.temp_dir / f"{timestamp}_{record.id}_{part.get_filename()}"
+            self._pending_saves.append(
+                self._attachment_pool.submit(self._save_attachment, part, filepath)
+            )
+
+    def _collect_saved_attachments(self) -> List[Path]:
+        """Wait for the queued saves and return the paths that landed."""
         pdf_files = []
-        
-        try:
-            for part in email_message.walk():
-                if part.get_content_maintype() == 'multipart':
-                    continue
-                if part.get('Content-Disposition') is None:
-                    continue
-                
-                filename = part.get_filename()
-                if filename and filename.lower().endswith('.pdf'):
-                    # Ensure temp directory exists
-                    self.temp_dir.mkdir(exist_ok=True)
-                    
-                    # Create unique filename
-                    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                    safe_filename = f"{timestamp}_{email_id}_{filename}"
-                    filepath = self.temp_dir / safe_filename
-                    
-                    # Save PDF file
-                    with open(filepath, 'wb') as f:
-                        f.write(part.get_payload(decode=True))
-                    
-                    pdf_files.append(filepath)
-                    logger.info(f"Extracted PDF: {filename} -> {filepath}")
-            
-            return pdf_files
-            
-        except Exception as e:
-            logger.error(f"Error extracting PDF attachments: {e}")
-            return pdf_files
-    
+        for future in self._pending_saves:
+            try:
+                pdf_files.append(future.result())
+            except Exception as e:
+                logger.error("Error extracting PDF attachment: %s", e)
+        self._pending_saves = []
+        return pdf_files
+
     def process_pdfs_through_pipeline(self) -> bool:
         """Process PDFs through the complete data pipeline"""
         try:
@@ -362,21 +644,16 @@ class PharmacyEmailMonitor:
             
             logger.info(f"Inserting data for {len(combined_data)} pharmacy/date combinations")
             
-            success_count = 0
+            # Prepare every row up front and land them in one batched
+            # statement instead of a round-trip per record
+            rows = []
             for key, data in combined_data.items():
                 try:
-                    # Extract the data properly for insertion
-                    insert_data = self.prepare_data_for_insertion(data)
-                    
-                    # Insert daily summary
-                    if self.db.insert_daily_summary(**insert_data):
-                        success_count += 1
-                        logger.info(f"✅ Inserted data for {key}")
-                    else:
-                        logger.error(f"❌ Failed to insert data for {key}")
+                    rows.append(self.prepare_data_for_insertion(data))
                 except Exception as e:
-                    logger.error(f"❌ Error inserting data for {key}: {e}")
-            
+                    logger.error("❌ Error preparing data for %s: %s", key, e)
+
+            success_count = self.db.insert_daily_summary_bulk(rows)
             logger.info(f"✅ Successfully inserted {success_count}/{len(combined_data)} records")
             
         except Exception as e:
@@ -387,47 +664,25 @@ class PharmacyEmailMonitor:
         try:
             # If data is nested (from complete_pipeline_data.json), extract the fields
             if isinstance(data, dict):
-                insert_data = {}
-                
-                # Extract basic info
-                insert_data['pharmacy_code'] = data.get('pharmacy', 'UNKNOWN')
-                insert_data['report_date'] = data.get('date', '2025-08-04')
-                
-                # Extract from trading summary
-                trading = data.get('trading_summary', {})
-                insert_data['stock_opening'] = trading.get('stock_opening')
-                insert_data['stock_closing'] = trading.get('stock_closing')
-                insert_data['purchases'] = trading.get('purchases')
-                insert_data['adjustments'] = trading.get('adjustments')
-                insert_data['cost_of_sales'] = trading.get('cost_of_sales')
-                insert_data['gp_value'] = trading.get('gp_value')
-                insert_data['gp_percent'] = trading.get('gp_percent')
-                
-                # Extract from turnover summary (override turnover)
-                turnover = data.get('turnover_summary', {})
-                insert_data['turnover'] = turnover.get('turnover')
-                insert_data['sales_cash'] = turnover.get('sales_cash')
-                insert_data['sales_account'] = turnover.get('sales_account')
-                insert_data['sales_cod'] = turnover.get('sales_cod')
-                
-                # Extract from transaction summary
-                transaction = data.get('transaction_summary', {})
-                insert_data['transactions_total'] = transaction.get('transactions_total')
-                insert_data['avg_basket_value'] = transaction.get('avg_basket_value')
-                
-                # Extract from gross profit
+                insert_data = {
+                    'pharmacy_code': data.get('pharmacy', 'UNKNOWN'),
+                    'report_date': data.get('date', '2025-08-04'),
+                }
+
+                # Flat copy of every mapped field, driven by the schema
+                # table instead of a hand-written .get() chain per column
+                for section, fields in _INSERT_SCHEMA:
+                    source = data.get(section) or {}
+                    for out_key, in_key in fields:
+                        insert_data[out_key] = source.get(in_key)
+
+                # Derived field: basket size from gross profit quantities
                 gross_profit = data.get('gross_profit', {})
-                if gross_profit and transaction.get('transactions_total'):
+                transactions = insert_data['transactions_total']
+                if gross_profit and transactions:
                     total_qty = gross_profit.get('total_sales_qty', 0)
-                    transactions = transaction.get('transactions_total', 1)
                     insert_data['avg_basket_size'] = total_qty / transactions if transactions > 0 else 0
-                
-                # Extract from dispensary summary
-                dispensary = data.get('dispensary_summary', {})
-                insert_data['script_total'] = dispensary.get('script_total')
-                insert_data['disp_turnover'] = dispensary.get('disp_turnover')
-                insert_data['avg_script_value'] = dispensary.get('avg_script_value')
-                
+
                 return insert_data
             else:
                 return data
@@ -441,8 +696,7 @@ class PharmacyEmailMonitor:
         try:
             # Try to load from complete pipeline data
             if os.path.exists('complete_pipeline_data.json'):
-                with open('complete_pipeline_data.json', 'r') as f:
-                    return json.load(f)
+                return _json_loads(Path('complete_pipeline_data.json').read_bytes())
             
             # Fallback: load individual files and combine
             combined_data = {}
@@ -459,16 +713,15 @@ class PharmacyEmailMonitor:
             for file in extraction_files:
                 if os.path.exists(file):
                     try:
-                        with open(file, 'r') as f:
-                            data = json.load(f)
-                            # Combine data based on pharmacy and date
-                            for item in data:
-                                key = f"{item.get('pharmacy', 'unknown')}_{item.get('date', 'unknown')}"
-                                if key not in combined_data:
-                                    combined_data[key] = {}
-                                combined_data[key].update(item)
+                        data = _json_loads(Path(file).read_bytes())
+                        # Combine data based on pharmacy and date
+                        for item in data:
+                            key = f"{item.get('pharmacy', 'unknown')}_{item.get('date', 'unknown')}"
+                            if key not in combined_data:
+                                combined_data[key] = {}
+                            combined_data[key].update(item)
                     except Exception as e:
-                        logger.error(f"Error loading {file}: {e}")
+                        logger.error("Error loading %s: %s", file, e)
             
             return combined_data
             
@@ -478,12 +731,21 @@ class PharmacyEmailMonitor:
     
     def cleanup_processed_files(self, pdf_files: List[Path]):
         """Clean up processed PDF files and temporary directories"""
+        # Serialize with any other cleanup in flight so two cycles never
+        # race over the same temp directories
+        with self._cleanup_lock:
+            self._cleanup_processed_files(pdf_files)
+
+    def _cleanup_processed_files(self, pdf_files: List[Path]):
         try:
-            # Remove extracted PDF files
+            # Remove extracted PDF files (no exists() pre-check - the files were
+            # just written by this cycle, so unlink directly and ignore misses)
             for pdf_file in pdf_files:
-                if pdf_file.exists():
+                try:
                     pdf_file.unlink()
-                    logger.info(f"Removed PDF file: {pdf_file}")
+                    logger.info("Removed PDF file: %s", pdf_file)
+                except FileNotFoundError:
+                    pass
             
             # Clean up temp directories
             temp_dirs = [
@@ -494,7 +756,7 @@ class PharmacyEmailMonitor:
             for temp_dir in temp_dirs:
                 if temp_dir.exists():
                     shutil.rmtree(temp_dir)
-                    logger.info(f"Removed temp directory: {temp_dir}")
+                    logger.info("Removed temp directory: %s", temp_dir)
             
             # Clean up JSON files (optional - keep for debugging)
             # json_files = Path('.').glob('*_extracted_data.json')
@@ -509,104 +771,194 @@ class PharmacyEmailMonitor:
     
     def keep_latest_versions(self, base_dir: str):
         """Within the classified PDF tree keep only the latest time-stamped file per (date, pharmacy, report_type)"""
-        from pathlib import Path
-        base = Path(base_dir)
-        if not base.exists():
+        if not os.path.isdir(base_dir):
             return
-        import re
-        latest_map = {}
-        # Traverse date/pharmacy folders
-        for pdf in base.rglob("*.pdf"):
-            name = pdf.name
-            # Expected pattern: <report_type>_<HHMM>_originalname.pdf
-            m = re.match(r"([a-z_]+)_(\d{4})_.*", name)
-            if not m:
-                continue
-            report_type, hhmm = m.group(1), m.group(2)
-            # parent directories give date and pharmacy
-            try:
-                pharmacy = pdf.parent.name  # pharmacy folder
-                date_str = pdf.parent.parent.name  # date folder
-            except Exception:
-                continue
-            key = (date_str, pharmacy, report_type)
-            if key not in latest_map or hhmm > latest_map[key]["time"]:
-                latest_map[key] = {"time": hhmm, "path": pdf}
+        # Single os.walk pass grouping files by (date, pharmacy,
+        # report_type), then delete everything but the newest HHMM per
+        # group — one traversal instead of the old two rglob sweeps, and
+        # plain strings instead of a Path object per entry.
+        groups: Dict[tuple, list] = {}
+        for dirpath, _dirnames, filenames in os.walk(base_dir):
+            # Tree layout is <base>/<date>/<pharmacy>/<file>.pdf
+            pharmacy = os.path.basename(dirpath)
+            date_str = os.path.basename(os.path.dirname(dirpath))
+            for name in filenames:
+                # Expected pattern: <report_type>_<HHMM>_originalname.pdf
+                m = _CLASSIFIED_NAME_RE.match(name)
+                if not m:
+                    continue
+                report_type, hhmm = m.group(1), m.group(2)
+                groups.setdefault((date_str, pharmacy, report_type), []).append(
+                    (hhmm, os.path.join(dirpath, name))
+                )
         # Delete older files
-        for pdf in base.rglob("*.pdf"):
-            name = pdf.name
-            m = re.match(r"([a-z_]+)_(\d{4})_.*", name)
-            if not m:
+        for entries in groups.values():
+            if len(entries) < 2:
                 continue
-            report_type, hhmm = m.group(1), m.group(2)
-            pharmacy = pdf.parent.name
-            date_str = pdf.parent.parent.name
-            key = (date_str, pharmacy, report_type)
-            if key in latest_map and latest_map[key]["path"] != pdf:
-                pdf.unlink(missing_ok=True)
-                # logger.info(f"Removed older version: {pdf}")
+            keep = max(entries)[1]  # HHMM sorts lexicographically
+            for _hhmm, path in entries:
+                if path != keep:
+                    try:
+                        os.unlink(path)
+                        # logger.info(f"Removed older version: {path}")
+                    except FileNotFoundError:
+                        pass
 
     def process_single_email_cycle(self):
         """Process one cycle of email checking with date-based logic"""
         logger.info("📧 Starting email check...")
         
-        mail = self.connect_imap()
+        mail = self._get_mail()
         if not mail:
             return False
-        
+
         try:
+            # Wait out the previous cycle's background cleanup before
+            # touching the temp dirs again: with IDLE the next cycle can
+            # start within seconds, and an rmtree racing this cycle's
+            # fetch could delete freshly written attachments that are
+            # never re-fetched once the UID mark advances
+            if self._cleanup_future is not None:
+                self._cleanup_future.result()
+                self._cleanup_future = None
+
+            # Recreate the temp dir once per cycle (cleanup removes it)
+            # before the fetch starts queueing attachment writes into it
+            self.temp_dir.mkdir(exist_ok=True)
+
             # Get recent emails with PDFs (last 2 days)
+            self._cycle_max_uid = self.last_uid
             recent_emails = self.get_recent_emails(mail, days=2)
             # expose count to outer app for logging
             self.last_email_count = len(recent_emails)
             logger.info(f"Found {len(recent_emails)} emails for the two days.")
 
             if not recent_emails:
+                self._advance_last_uid()
                 return True
             
-            # Extract all PDFs from all emails into the temp directory
-            all_extracted_pdfs = []
-            for email_data in recent_emails:
-                pdfs = self.extract_pdf_attachments(email_data['message'], email_data['id'])
-                all_extracted_pdfs.extend(pdfs)
+            # The decode+write futures were queued during the fetch, so by
+            # now most attachments are already on disk; just collect them
+            all_extracted_pdfs = self._collect_saved_attachments()
 
             if not all_extracted_pdfs:
                 logger.info("No PDF attachments found in recent emails.")
+                self._advance_last_uid()
                 return True
 
             # Process all extracted PDFs through the pipeline
             success = self.process_pdfs_through_pipeline()
-            
+
             if success:
-                # Clean up all files at once
-                self.cleanup_processed_files(all_extracted_pdfs)
+                # Only advance the UID high-water mark once the pipeline has
+                # landed, so a failed cycle retries the same mail next time
+                self._advance_last_uid()
+                # Hand cleanup to the background worker so the cycle returns
+                # without waiting on the unlink/rmtree storm; the next
+                # cycle waits on this future before writing new files
+                self._cleanup_future = self._cleanup_pool.submit(
+                    self.cleanup_processed_files, all_extracted_pdfs)
             
             return success
-            
-        finally:
-            mail.logout()
+
+        except (imaplib.IMAP4.abort, OSError):
+            # Connection died mid-cycle; reconnect next time round
+            self._discard_mail()
+            raise
     
+    def wait_for_new_mail(self, timeout_seconds: float) -> bool:
+        """Block until the server announces new mail or the timeout elapses.
+
+        Uses IMAP IDLE (RFC 2177) so new reports are picked up within
+        seconds instead of waiting out the full polling interval. Returns
+        True if the server flagged new mail. Falls back to a plain
+        interruptible sleep when IDLE is unavailable or errors out.
+        """
+        mail = self._get_mail()
+        if not mail:
+            self._stop.wait(timeout_seconds)
+            return False
+
+        saw_new_mail = False
+        try:
+            if 'IDLE' not in mail.capabilities:
+                logger.debug("Server does not advertise IDLE; falling back to sleep")
+                self._stop.wait(timeout_seconds)
+                return False
+
+            mail.select('INBOX')
+            tag = mail._new_tag().decode()
+            mail.send(f'{tag} IDLE\r\n'.encode())
+            if not mail.readline().startswith(b'+'):
+                logger.warning("IDLE command rejected; falling back to sleep")
+                self._stop.wait(timeout_seconds)
+                return False
+
+            # Poll the socket in short slices so SIGTERM still interrupts
+            # promptly; SSL buffering makes select() unreliable here, so
+            # use a socket timeout around readline instead
+            deadline = time.monotonic() + timeout_seconds
+            mail.sock.settimeout(5)
+            while not self._stop.is_set() and time.monotonic() < deadline:
+                try:
+                    line = mail.readline()
+                except (TimeoutError, OSError):
+                    continue
+                if not line:
+                    break
+                if b'EXISTS' in line or b'RECENT' in line:
+                    saw_new_mail = True
+                    break
+
+            # End the IDLE session and drain through the tagged completion
+            mail.sock.settimeout(30)
+            mail.send(b'DONE\r\n')
+            while True:
+                line = mail.readline()
+                if not line or line.startswith(tag.encode()):
+                    break
+
+            return saw_new_mail
+
+        except (imaplib.IMAP4.error, OSError) as e:
+            # The connection state after a failed IDLE is unknown; drop it
+            # so the next cycle reconnects cleanly
+            logger.warning("IDLE wait failed (%s); falling back to sleep", e)
+            self._discard_mail()
+            self._stop.wait(max(0, timeout_seconds))
+            return saw_new_mail
+
     def run_continuous_monitoring(self, interval_minutes: int = 10):
         """Run continuous email monitoring"""
         logger.info(f"🚀 Starting continuous email monitoring (checking every {interval_minutes} minutes)")
-        
-        while True:
+
+        while not self._stop.is_set():
             try:
                 self.process_single_email_cycle()
-                
-                # Wait for next cycle
-                logger.info(f"⏰ Waiting {interval_minutes} minutes until next check...")
-                time.sleep(interval_minutes * 60)
-                
+
+                if self._stop.is_set():
+                    break
+
+                # Wait for new mail via IMAP IDLE; on server silence this
+                # still wakes within the polling interval so the periodic
+                # sweep of the last two days keeps running as before
+                logger.info(f"⏰ Idling for up to {interval_minutes} minutes until new mail or next check...")
+                if self.wait_for_new_mail(min(interval_minutes * 60, IDLE_TIMEOUT_SECONDS)):
+                    logger.info("📬 Server announced new mail; checking immediately")
+
             except KeyboardInterrupt:
                 logger.info("🛑 Email monitoring stopped by user")
                 break
             except Exception as e:
                 logger.error(f"❌ Email monitoring error: {e}")
                 logger.info("⏰ Waiting 5 minutes before retrying...")
-                time.sleep(5 * 60)
+                if self._stop.wait(5 * 60):
+                    break
         
-        # Cleanup
+        # Cleanup - wait for any in-flight file cleanup so nothing leaks
+        self._attachment_pool.shutdown(wait=True)
+        self._cleanup_pool.shutdown(wait=True)
+        self._discard_mail()
         if self.db:
             self.db.close()
 
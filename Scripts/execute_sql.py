@@ -6,42 +6,134 @@ Execute SQL File
 This script executes the SQL file to insert today's Winterton data into the database.
 """
 
+import io
 import os
+import re
 import sys
 
 # Add Scripts directory to path for imports
 script_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(script_dir)
 
+# Column order of the generated daily_summary INSERT statements
+# (after pharmacy_id and report_date)
+_SUMMARY_COLUMNS = (
+    'turnover', 'gp_percent', 'gp_value', 'cost_of_sales', 'purchases',
+    'avg_basket_value', 'avg_basket_size', 'transactions_total',
+    'script_total', 'avg_script_value', 'disp_turnover', 'stock_opening',
+    'stock_closing', 'adjustments', 'sales_cash', 'sales_cod', 'sales_account'
+)
+
+# Matches one generated INSERT: pharmacy code, report date, then the
+# numeric VALUES tail up to the ON CONFLICT clause
+_INSERT_RE = re.compile(
+    r"INSERT INTO daily_summary \([^)]*\) VALUES \(\s*"
+    r"\(SELECT id FROM pharmacies WHERE pharmacy_code = '([^']+)'\),\s*"
+    r"'([^']+)',\s*([^;]+?)\) ON CONFLICT"
+)
+
+
+def _parse_insert_rows(sql_content: str):
+    """Parse the generated INSERT statements into (code, date, values) rows
+
+    Returns None if any statement doesn't match the expected shape, so the
+    caller can fall back to executing the raw SQL.
+    """
+    rows = []
+    for match in _INSERT_RE.finditer(sql_content):
+        pharmacy_code, report_date, values_blob = match.groups()
+        values = [v.strip() for v in values_blob.split(',')]
+        if len(values) != len(_SUMMARY_COLUMNS):
+            return None
+        rows.append((pharmacy_code, report_date, values))
+
+    if not rows or sql_content.count('INSERT INTO daily_summary') != len(rows):
+        return None
+    return rows
+
+
+def _copy_rows(db, rows):
+    """Bulk-load rows via COPY into a temp table, then one upsert from it
+
+    COPY streams all rows in a single command, and the single
+    INSERT ... SELECT resolves every pharmacy_id with one join instead of
+    one subquery per row.
+    """
+    columns = ', '.join(_SUMMARY_COLUMNS)
+    update_set = ',\n    '.join(f"{c} = EXCLUDED.{c}" for c in _SUMMARY_COLUMNS)
+
+    buffer = io.StringIO()
+    for pharmacy_code, report_date, values in rows:
+        # The generator emits the literal NULL (or an unreplaced None)
+        # for missing metrics; COPY text format wants \N for a missing
+        # value, and the string 'NULL' fails the NUMERIC conversion
+        fields = [pharmacy_code, report_date] + [
+            r'\N' if v.upper() in ('NULL', 'NONE') else v for v in values
+        ]
+        buffer.write('\t'.join(fields))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    with db.conn.cursor() as cursor:
+        # Daily idempotent batch: skipping the WAL flush wait is safe
+        # because a load lost to a crash is simply re-run. LOCAL scopes
+        # the setting to this transaction only.
+        cursor.execute("SET LOCAL synchronous_commit = off")
+        cursor.execute(f"""
+            CREATE TEMP TABLE _daily_summary_load (
+                pharmacy_code TEXT,
+                report_date DATE,
+                {', '.join(f'{c} NUMERIC' for c in _SUMMARY_COLUMNS)}
+            ) ON COMMIT DROP
+        """)
+        cursor.copy_expert(
+            "COPY _daily_summary_load FROM STDIN WITH (FORMAT text)", buffer)
+        cursor.execute(f"""
+            INSERT INTO daily_summary (pharmacy_id, report_date, {columns})
+            SELECT p.id, l.report_date, {', '.join('l.' + c for c in _SUMMARY_COLUMNS)}
+            FROM _daily_summary_load l
+            JOIN pharmacies p ON p.pharmacy_code = l.pharmacy_code
+            ON CONFLICT (pharmacy_id, report_date) DO UPDATE SET
+            {update_set}
+        """)
+    db.conn.commit()
+
+
 def execute_sql_file():
     """Execute the SQL file to insert today's data"""
     print("🚀 Executing SQL file to insert today's Winterton data...")
-    
+
     # Use DATABASE_URL from environment; ensure it is set
     if not os.getenv('DATABASE_URL'):
         print("❌ DATABASE_URL not set in environment")
         return
-    
+
     try:
         from render_database_connection import RenderPharmacyDatabase
         db = RenderPharmacyDatabase()
-        
+
         # Read and execute SQL file
         with open('complete_database_inserts.sql', 'r') as f:
             sql_content = f.read()
-        
+
         print("📄 SQL file loaded successfully")
         print(f"📊 SQL file size: {len(sql_content)} characters")
-        
-        # Execute the SQL
-        db.execute_query(sql_content)
-        print("✅ SQL executed successfully!")
-        
+
+        # Bulk-load via COPY when the file has the generated shape;
+        # fall back to executing the raw SQL for anything else
+        rows = _parse_insert_rows(sql_content)
+        if rows is not None:
+            _copy_rows(db, rows)
+            print(f"✅ Bulk-loaded {len(rows)} rows via COPY!")
+        else:
+            db.execute_query(sql_content)
+            print("✅ SQL executed successfully!")
+
         print("\n🎉 Today's Winterton data has been inserted into the database!")
         print("💡 You can now check the database for today's turnover data.")
-        
+
     except Exception as e:
         print(f"❌ Error executing SQL: {e}")
 
 if __name__ == "__main__":
-    execute_sql_file() 
\ No newline at end of file
+    execute_sql_file()
@@ -0,0 +1,31 @@
+"""
+Sidecar extraction cache shared by the summary extractors.
+
+Keys are name:size:mtime, so unchanged PDFs skip extraction entirely on
+reruns - the common case on a cron - while any rewrite or replacement of
+a file invalidates its entry. Callers persist only the keys seen in the
+current run so stale entries age out.
+"""
+
+import json
+from pathlib import Path
+
+
+def load_cache(cache_path: Path) -> dict:
+    """Load a sidecar cache, returning an empty dict when absent or corrupt"""
+    try:
+        return json.loads(cache_path.read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def file_key(pdf_file: Path) -> str:
+    """Cache key for a PDF: invalidated when the file changes on disk"""
+    stat = pdf_file.stat()
+    return f"{pdf_file.name}:{stat.st_size}:{int(stat.st_mtime)}"
+
+
+def save_cache(cache_path: Path, cache: dict) -> None:
+    """Persist the cache next to the JSON outputs"""
+    with open(cache_path, 'w') as f:
+        json.dump(cache, f, indent=2, default=str)
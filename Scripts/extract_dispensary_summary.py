@@ -1,52 +1,99 @@
-import fitz  # PyMuPDF
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, Optional, Any
 import json
 
-def extract_pharmacy_and_date(pdf_path: str) -> tuple[str, str]:
+import extract_cache
+from report_common import (
+    DATE_RANGE_RE, dump_json, format_currency, page_texts, parse_end_date
+)
+
+# Patterns compiled once at import so per-PDF calls skip re-compilation
+# and the re module's internal cache entirely. Both date-range label
+# variants are branches of the shared unified pattern: one search per
+# file instead of up to five
+_DATE_PATTERNS = (DATE_RANGE_RE,)
+
+# Total number of documents dispensed. The gaps are bounded
+# ([^\n]*? on one line, [\s\S]{0,400}? across a few lines) instead of
+# the old unbounded DOTALL .*?, which backtracked across the whole
+# multi-page text whenever the tail of a pattern failed to match
+_SCRIPT_PATTERNS = (
+    re.compile(r'^NUMBER OF DOCUMENTS - DISPENSED[^\n]*?(\d+)\s*$', re.MULTILINE | re.IGNORECASE),
+    re.compile(r'NUMBER OF DOCUMENTS - DISPENSED[\s\S]{0,400}?TOTAL\s+(\d+)', re.IGNORECASE),
+    re.compile(r'DOCTOR[\s\S]{0,400}?TOTAL\s+(\d+)[\s\S]{0,400}?'
+               r'PAT/OTC[\s\S]{0,400}?TOTAL\s+(\d+)[\s\S]{0,400}?TOTAL\s+(\d+)', re.IGNORECASE)
+)
+
+# Trailing integer on a line, for the script-total fallback
+_TAIL_INT = re.compile(r'(\d+)\s*$')
+
+# Total revenue, with the same bounded gaps
+_REVENUE_PATTERNS = (
+    re.compile(r'TOTAL REVENUE[ \t]+([\d,]+\.?\d*)', re.IGNORECASE),
+    re.compile(r'TOTAL REVENUE[\s\S]{0,400}?GROSS INCOME\s+([\d,]+\.?\d*)', re.IGNORECASE),
+    re.compile(r'TOTAL REVENUE[\s\S]{0,400}?NETT INCOME\s+([\d,]+\.?\d*)', re.IGNORECASE)
+)
+
+def _collect_pages(pdf_path: str) -> list:
+    """Per-page text, stopping once both target sections have been seen
+
+    On these summaries the script-count and revenue sections sit on the
+    first page or two, so the rest of the document never needs text
+    extraction. Falls back to the full document when a section is missing.
+    """
+    pages = page_texts(pdf_path)
+    pieces = []
+    have_scripts = have_revenue = False
+    try:
+        for page_text in pages:
+            pieces.append(page_text)
+            page_upper = page_text.upper()
+            have_scripts = have_scripts or 'NUMBER OF DOCUMENTS - DISPENSED' in page_upper
+            have_revenue = have_revenue or 'TOTAL REVENUE' in page_upper
+            if have_scripts and have_revenue:
+                break
+    finally:
+        pages.close()
+    return pieces
+
+def extract_pharmacy_and_date(pdf_path: str, text: Optional[str] = None) -> tuple[str, str]:
     """
     Extract pharmacy name and date from the PDF
     Returns tuple of (pharmacy_name, date_string)
+
+    If the caller already holds the first page's text, pass it via
+    `text` to skip re-opening and re-parsing the PDF.
     """
-    doc = fitz.open(pdf_path)
-    text = doc[0].get_text().upper()  # Get first page text
-    doc.close()
-    
+    if text is None:
+        pages = page_texts(pdf_path)
+        try:
+            text = next(pages, '')  # Get first page text
+        finally:
+            pages.close()
+    text = text.upper()
+
     # Extract pharmacy name
     pharmacy_name = "UNKNOWN"
     if "REITZ" in text:
         pharmacy_name = "REITZ"
     elif "WINTERTON" in text or "TLC" in text:
         pharmacy_name = "TLC WINTERTON"
-    
-    # Extract date
-    date_patterns = [
-        r'from:\s*(\d{4})/(\d{1,2})/(\d{1,2})\s+to:\s*(\d{4})/(\d{1,2})/(\d{1,2})',
-        r'(\d{4})/(\d{1,2})/(\d{1,2})\s*-\s*(\d{4})/(\d{1,2})/(\d{1,2})',
-        r'range.*from:\s*(\d{4})/(\d{1,2})/(\d{1,2})\s+to:\s*(\d{4})/(\d{1,2})/(\d{1,2})',
-        r'period.*from:\s*(\d{4})/(\d{1,2})/(\d{1,2})\s+to:\s*(\d{4})/(\d{1,2})/(\d{1,2})',
-        r'date from\s*:\s*(\d{4})/(\d{1,2})/(\d{1,2})\s+date to\s*:\s*(\d{4})/(\d{1,2})/(\d{1,2})'
-    ]
-    
-    date_str = None
-    for pattern in date_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            # Use the end date (last 3 values)
-            if len(match.groups()) == 6:
-                year, month, day = match.group(4), match.group(5), match.group(6)
-            else:
-                year, month, day = match.group(1), match.group(2), match.group(3)
-            date_str = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-            break
-    
+
+    # Extract date (end of the reporting range)
+    date_str = parse_end_date(text, _DATE_PATTERNS)
+
     return pharmacy_name, date_str
 
-def extract_dispensary_summary_data(pdf_path: str) -> Dict[str, Any]:
+def extract_dispensary_summary_data(pdf_path: str, text: Optional[str] = None) -> Dict[str, Any]:
     """
     Extract dispensary summary data from a PDF file
+
+    If the caller already holds the document's text, pass it via `text`
+    to skip re-opening and re-parsing the PDF.
     
     Returns a dictionary with:
     - script_total: Total number of scripts
@@ -54,26 +101,21 @@ def extract_dispensary_summary_data(pdf_path: str) -> Dict[str, Any]:
     - avg_script_value: Average script value
     """
     
-    doc = fitz.open(pdf_path)
-    text = ""
-    for page in doc:
-        text += page.get_text()
-    text = text.upper()
-    doc.close()
-    
+    if text is None:
+        # Single join instead of repeated += - string concatenation in a
+        # loop copies the accumulated text again for every page
+        text = ''.join(_collect_pages(pdf_path))
+
+    # No full-text .upper() copy: the content patterns are compiled with
+    # IGNORECASE instead, which stays on the regex engine's ASCII fast
+    # path and avoids duplicating a multi-page string per PDF
+
     # Extract script total from "NUMBER OF DOCUMENTS DISPENSED" section
     # Look for the TOTAL value in the detailed dispensing statistics
     script_total = None
-    
-    # Pattern to find the total number of documents dispensed
-    script_patterns = [
-        r'NUMBER OF DOCUMENTS - DISPENSED.*?(\d+)\s*$',
-        r'NUMBER OF DOCUMENTS - DISPENSED.*?TOTAL\s+(\d+)',
-        r'DOCTOR.*?TOTAL\s+(\d+).*?PAT/OTC.*?TOTAL\s+(\d+).*?TOTAL\s+(\d+)'
-    ]
-    
-    for pattern in script_patterns:
-        match = re.search(pattern, text, re.DOTALL)
+
+    for pattern in _SCRIPT_PATTERNS:
+        match = pattern.search(text)
         if match:
             if len(match.groups()) == 1:
                 script_total = int(match.group(1))
@@ -86,29 +128,21 @@ def extract_dispensary_summary_data(pdf_path: str) -> Dict[str, Any]:
     if script_total is None:
         lines = text.split('\n')
         for line in lines:
-            if 'NUMBER OF DOCUMENTS - DISPENSED' in line:
-                # Split the line and get the last number
-                parts = line.split()
-                for part in reversed(parts):
-                    if part.isdigit():
-                        script_total = int(part)
-                        break
+            if 'NUMBER OF DOCUMENTS - DISPENSED' in line.upper():
+                # Grab the trailing number in one search instead of
+                # splitting the line and scanning tokens in reverse
+                match = _TAIL_INT.search(line)
+                if match:
+                    script_total = int(match.group(1))
                 break
     
 
     
     # Extract total revenue from "TOTAL REVENUE" section
     disp_turnover_including_vat = None
-    
-    # Pattern to find total revenue
-    revenue_patterns = [
-        r'TOTAL REVENUE\s+([\d,]+\.?\d*)',
-        r'TOTAL REVENUE.*?GROSS INCOME\s+([\d,]+\.?\d*)',
-        r'TOTAL REVENUE.*?NETT INCOME\s+([\d,]+\.?\d*)'
-    ]
-    
-    for pattern in revenue_patterns:
-        match = re.search(pattern, text, re.DOTALL)
+
+    for pattern in _REVENUE_PATTERNS:
+        match = pattern.search(text)
         if match:
             # Remove commas and convert to float
             revenue_str = match.group(1).replace(',', '')
@@ -132,14 +166,21 @@ def extract_dispensary_summary_data(pdf_path: str) -> Dict[str, Any]:
         "avg_script_value": avg_script_value
     }
 
-def format_currency(amount: float) -> str:
-    """Format amount as currency with commas"""
-    if amount is None:
-        return "N/A"
-    elif amount < 0:
-        return f"-R{abs(amount):,.2f}"
-    else:
-        return f"R{amount:,.2f}"
+def _process_one(pdf_path: str) -> Dict[str, Any]:
+    """Extract everything from a single dispensary summary PDF (worker for the process pool)"""
+    # Open and parse the document once, then feed both extraction steps
+    # from the collected page text
+    pieces = _collect_pages(pdf_path)
+    pharmacy_name, date_str = extract_pharmacy_and_date(
+        pdf_path, text=pieces[0] if pieces else '')
+    dispensary_data = extract_dispensary_summary_data(pdf_path, text=''.join(pieces))
+
+    return {
+        'file': Path(pdf_path).name,
+        'pharmacy': pharmacy_name,
+        'date': date_str,
+        **dispensary_data
+    }
 
 def process_all_dispensary_summaries(base_dir: str = "../temp_classified_pdfs"):
     """
@@ -160,23 +201,37 @@ def process_all_dispensary_summaries(base_dir: str = "../temp_classified_pdfs"):
 
     print(f"Found {len(dispensary_files)} dispensary summary files")
 
-    all_data = []
+    # Sidecar cache keyed on (name, size, mtime): unchanged PDFs skip
+    # extraction entirely on reruns, which is the common case on a cron
+    cache_path = Path("dispensary_summary_cache.json")
+    cache = extract_cache.load_cache(cache_path)
 
+    all_data = []
+    to_process = []
+    fresh_cache = {}
     for pdf_file in dispensary_files:
-        pharmacy_name, date_str = extract_pharmacy_and_date(str(pdf_file))
-        dispensary_data = extract_dispensary_summary_data(str(pdf_file))
+        key = extract_cache.file_key(pdf_file)
+        if key in cache:
+            fresh_cache[key] = cache[key]
+            all_data.append(cache[key])
+        else:
+            to_process.append((key, pdf_file))
+
+    if to_process:
+        # Each PDF is independent, so fan the extraction out across cores;
+        # PyMuPDF parsing dominates and parallelizes cleanly in processes
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+            results = list(executor.map(
+                _process_one, (str(p) for _, p in to_process), chunksize=4))
+        for (key, _), result in zip(to_process, results):
+            fresh_cache[key] = result
+            all_data.append(result)
 
-        complete_data = {
-            'file': pdf_file.name,
-            'pharmacy': pharmacy_name,
-            'date': date_str,
-            **dispensary_data
-        }
-        all_data.append(complete_data)
+    # Persist only keys seen this run so stale entries age out
+    extract_cache.save_cache(cache_path, fresh_cache)
 
     output_file = Path("dispensary_summary_extracted_data.json")
-    with open(output_file, 'w') as f:
-        json.dump(all_data, f, indent=2, default=str)
+    dump_json(output_file, all_data)
 
 if __name__ == "__main__":
     process_all_dispensary_summaries() 
\ No newline at end of file
@@ -1,48 +1,62 @@
-import fitz  # PyMuPDF
+import os
 import re
-import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, Optional, Any
 import json
 
-def extract_pharmacy_and_date(pdf_path: str) -> tuple[str, str]:
+from report_common import (
+    DATE_RANGE_RE, dump_json, format_currency, page_texts, parse_end_date
+)
+
+# Patterns compiled once at import so per-PDF calls skip re-compilation
+# and the re module's internal cache entirely. Both date-range label
+# variants are branches of the shared unified pattern: one search per
+# file instead of up to five
+_DATE_PATTERNS = (DATE_RANGE_RE,)
+
+# Gross profit report data line: dept, stock code, description, then
+# the numeric columns (on hand, qty, value, cost, GP, turnover%, GP%).
+# Some report formats omit the turnover% column, so the second-to-last
+# group is optional: one match attempt covers both layouts instead of a
+# failed-then-retry pass with a second pattern. MULTILINE so the
+# pattern scans whole pages in C - header, footer and separator lines
+# are rejected by the anchors without a Python-level filter loop
+_GP_LINE = re.compile(
+    r"^[ \t]*([A-Z0-9]{6})[ \t]+([A-Z0-9\-]{4,})[ \t]+(.*?)[ \t]+"
+    r"(-?\d+\.\d{3})[ \t]+(-?\d+\.\d{3})[ \t]+(-?\d+\.\d{2})[ \t]+"
+    r"(-?\d+\.\d{2})[ \t]+(-?\d+\.\d{2})[ \t]+(-?\d+\.\d{3})"
+    r"(?:[ \t]+(-?\d+\.\d{3}))?[ \t]*$",
+    re.MULTILINE
+)
+
+def extract_pharmacy_and_date(pdf_path: str, text: Optional[str] = None) -> tuple[str, str]:
     """
     Extract pharmacy name and date from the PDF
     Returns tuple of (pharmacy_name, date_string)
+
+    If the caller already holds the first page's text, pass it via
+    `text` to skip re-opening and re-parsing the PDF.
     """
-    doc = fitz.open(pdf_path)
-    text = doc[0].get_text().upper()  # Get first page text
-    doc.close()
-    
+    if text is None:
+        pages = page_texts(pdf_path)
+        try:
+            text = next(pages, '')  # Get first page text
+        finally:
+            pages.close()
+    text = text.upper()
+
     # Extract pharmacy name
     pharmacy_name = "UNKNOWN"
     if "REITZ" in text:
         pharmacy_name = "REITZ"
     elif "WINTERTON" in text or "TLC" in text:
         pharmacy_name = "TLC WINTERTON"
-    
-    # Extract date
-    date_patterns = [
-        r'from:\s*(\d{4})/(\d{1,2})/(\d{1,2})\s+to:\s*(\d{4})/(\d{1,2})/(\d{1,2})',
-        r'(\d{4})/(\d{1,2})/(\d{1,2})\s*-\s*(\d{4})/(\d{1,2})/(\d{1,2})',
-        r'range.*from:\s*(\d{4})/(\d{1,2})/(\d{1,2})\s+to:\s*(\d{4})/(\d{1,2})/(\d{1,2})',
-        r'period.*from:\s*(\d{4})/(\d{1,2})/(\d{1,2})\s+to:\s*(\d{4})/(\d{1,2})/(\d{1,2})',
-        r'date from\s*:\s*(\d{4})/(\d{1,2})/(\d{1,2})\s+date to\s*:\s*(\d{4})/(\d{1,2})/(\d{1,2})'
-    ]
-    
-    date_str = None
-    for pattern in date_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            # Use the end date (last 3 values)
-            if len(match.groups()) == 6:
-                year, month, day = match.group(4), match.group(5), match.group(6)
-            else:
-                year, month, day = match.group(1), match.group(2), match.group(3)
-            date_str = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-            break
-    
+
+    # Extract date (end of the reporting range)
+    date_str = parse_end_date(text, _DATE_PATTERNS)
+
     return pharmacy_name, date_str
 
 def map_department_code(detailed_code: str) -> str:
@@ -54,65 +68,49 @@ def map_department_code(detailed_code: str) -> str:
         return detailed_code[:4]
     return detailed_code
 
-def extract_gross_profit_data(pdf_path: str) -> Dict[str, Any]:
+def extract_gross_profit_data(pdf_path: str, text: Optional[str] = None) -> Dict[str, Any]:
     """
     Extract gross profit report data from a PDF file
+
+    If the caller already holds the document's text, pass it via `text`
+    to skip re-opening and re-parsing the PDF.
     
     Returns a dictionary with the extracted data:
     - sales_details: List of sales records with stock codes, descriptions, quantities, values, etc.
     - summary_stats: Summary statistics
     """
     
-    doc = fitz.open(pdf_path)
-    
-    # Step 1: Clean raw lines by removing headers, footers, and subtotal blocks
-    cleaned_lines = []
-    header_keywords = [
-        "REITZ APTEEK", "TLC PHARMACY", "WINTERTON", "PAGE:", "CODE", "DESCRIPTION", "ON HAND", 
-        "SALES", "COST", "GROSS", "TURNOVER", "GP%", "QTY", "VALUE", "GROSS PROFIT REPORT"
-    ]
-    exclusion_keywords = ["MAIN-DEPT", "SUB-DEPT", "TOTAL", "-------", "===", "***"]
-    
-    for page in doc:
-        lines = page.get_text().split("\n")
-        for line in lines:
-            # Skip header lines
-            if any(keyword in line.upper() for keyword in header_keywords):
-                continue
-            # Skip exclusion lines
-            if any(keyword in line.upper() for keyword in exclusion_keywords):
-                continue
-            # Skip empty or separator lines
-            if set(line.strip()) <= {"-", " ", "=", "*"}:
-                continue
-            # Skip lines that are too short to be data
-            if len(line.strip()) < 20:
-                continue
-            cleaned_lines.append(line.strip())
-    
-    doc.close()
-    
-    # Step 2: Define regex pattern to extract structured sales data
-    # Pattern for gross profit report lines
-    pattern = re.compile(
-        r"^([A-Z0-9]{6})\s+([A-Z0-9\-]{4,})\s+(.*?)\s+"
-        r"(-?\d+\.\d{3})\s+(-?\d+\.\d{3})\s+(-?\d+\.\d{2})\s+"
-        r"(-?\d+\.\d{2})\s+(-?\d+\.\d{2})\s+(-?\d+\.\d{3})\s+(-?\d+\.\d{3})$"
-    )
-    
-    # Alternative pattern for different formatting
-    pattern2 = re.compile(
-        r"^([A-Z0-9]{6})\s+([A-Z0-9\-]{4,})\s+(.*?)\s+"
-        r"(-?\d+\.\d{3})\s+(-?\d+\.\d{3})\s+(-?\d+\.\d{2})\s+"
-        r"(-?\d+\.\d{2})\s+(-?\d+\.\d{2})\s+(-?\d+\.\d{3})$"
-    )
-    
-    # Step 3: Extract matched values
+    if text is None:
+        pages = list(page_texts(pdf_path))
+    else:
+        pages = [text]
+
+    # Step 1: Scan each page with the anchored MULTILINE pattern. The C
+    # regex engine walks the raw page text directly; header, footer,
+    # subtotal and separator lines simply fail the anchors, so no Python
+    # per-line filtering is needed.
     records = []
-    for line in cleaned_lines:
-        match = pattern.match(line)
-        if match:
-            dept, stock_code, desc, on_hand, sales_qty, sales_val, sales_cost, gp_val, turnover_pct, gp_pct = match.groups()
+    # Totals accumulate while parsing so the summary needs no extra
+    # passes over the records list afterwards
+    total_value = total_cost = total_gp = total_qty = total_soh = 0.0
+    # Local binding: LOAD_FAST instead of a global lookup per float()
+    # call, and map() runs the builtin in a C loop across the six
+    # mandatory numeric columns
+    _float = float
+    for page_text in pages:
+        for match in _GP_LINE.finditer(page_text):
+            groups = match.groups()
+            dept, stock_code, desc = groups[0], groups[1], groups[2]
+            soh, qty, value, cost, gp, ninth = map(_float, groups[3:9])
+            tenth = groups[9]
+            # With the optional column absent, the ninth group is GP%;
+            # with it present, the ninth is turnover% and the tenth GP%
+            if tenth is not None:
+                turnover_pct = ninth
+                gp_pct = _float(tenth)
+            else:
+                turnover_pct = None
+                gp_pct = ninth
             # Map the detailed department code to main department code
             main_dept_code = map_department_code(dept.strip())
             records.append({
@@ -120,43 +118,28 @@ def extract_gross_profit_data(pdf_path: str) -> Dict[str, Any]:
                 "original_department_code": dept.strip(),  # Keep original for reference
                 "stock_code": stock_code.strip(),
                 "description": desc.strip(),
-                "soh": float(on_hand),  # Stock on Hand
-                "sales_qty": float(sales_qty),
-                "sales_value": float(sales_val),
-                "sales_cost": float(sales_cost),
-                "gross_profit": float(gp_val),
-                "turnover_percent": float(turnover_pct),
-                "gross_profit_percent": float(gp_pct)
+                "soh": soh,
+                "sales_qty": qty,
+                "sales_value": value,
+                "sales_cost": cost,
+                "gross_profit": gp,
+                "turnover_percent": turnover_pct,
+                "gross_profit_percent": gp_pct
             })
-        else:
-            # Try alternative pattern
-            match2 = pattern2.match(line)
-            if match2:
-                dept, stock_code, desc, on_hand, sales_qty, sales_val, sales_cost, gp_val, gp_pct = match2.groups()
-                # Map the detailed department code to main department code
-                main_dept_code = map_department_code(dept.strip())
-                records.append({
-                    "department_code": main_dept_code,  # Use mapped 4-character code
-                    "original_department_code": dept.strip(),  # Keep original for reference
-                    "stock_code": stock_code.strip(),
-                    "description": desc.strip(),
-                    "soh": float(on_hand),
-                    "sales_qty": float(sales_qty),
-                    "sales_value": float(sales_val),
-                    "sales_cost": float(sales_cost),
-                    "gross_profit": float(gp_val),
-                    "turnover_percent": None,
-                    "gross_profit_percent": float(gp_pct)
-                })
+            total_value += value
+            total_cost += cost
+            total_gp += gp
+            total_qty += qty
+            total_soh += soh
     
-    # Step 4: Calculate summary statistics
+    # Step 2: Calculate summary statistics
     summary_stats = {
         "total_records": len(records),
-        "total_sales_value": sum(record["sales_value"] for record in records),
-        "total_sales_cost": sum(record["sales_cost"] for record in records),
-        "total_gross_profit": sum(record["gross_profit"] for record in records),
-        "total_sales_qty": sum(record["sales_qty"] for record in records),
-        "total_soh": sum(record["soh"] for record in records)
+        "total_sales_value": total_value,
+        "total_sales_cost": total_cost,
+        "total_gross_profit": total_gp,
+        "total_sales_qty": total_qty,
+        "total_soh": total_soh
     }
     
     if summary_stats["total_sales_value"] > 0:
@@ -169,14 +152,22 @@ def extract_gross_profit_data(pdf_path: str) -> Dict[str, Any]:
         "summary_stats": summary_stats
     }
 
-def format_currency(amount: float) -> str:
-    """Format amount as currency with commas"""
-    if amount is None:
-        return "N/A"
-    elif amount < 0:
-        return f"-R{abs(amount):,.2f}"
-    else:
-        return f"R{amount:,.2f}"
+def _process_one(pdf_path: str) -> Dict[str, Any]:
+    """Extract everything from a single gross profit report PDF (worker for the process pool)"""
+    # Open and parse the document once, then feed both extraction steps
+    # from the collected page text. Joining on newline keeps line
+    # boundaries intact for the anchored data-line patterns.
+    pages = list(page_texts(pdf_path))
+    pharmacy_name, date_str = extract_pharmacy_and_date(
+        pdf_path, text=pages[0] if pages else '')
+    gross_profit_data = extract_gross_profit_data(pdf_path, text='\n'.join(pages))
+
+    return {
+        'file': Path(pdf_path).name,
+        'pharmacy': pharmacy_name,
+        'date': date_str,
+        **gross_profit_data
+    }
 
 def process_all_gross_profit_reports(base_dir: str = "../temp_classified_pdfs"):
     """
@@ -194,26 +185,16 @@ def process_all_gross_profit_reports(base_dir: str = "../temp_classified_pdfs"):
     if not gross_profit_files:
         print("No gross profit report files found")
         return
-    
-    print(f"Found {len(gross_profit_files)} gross profit report files")
-
-    all_data = []
 
-    for pdf_file in gross_profit_files:
-        pharmacy_name, date_str = extract_pharmacy_and_date(str(pdf_file))
-        gross_profit_data = extract_gross_profit_data(str(pdf_file))
+    print(f"Found {len(gross_profit_files)} gross profit report files")
 
-        complete_data = {
-            'file': pdf_file.name,
-            'pharmacy': pharmacy_name,
-            'date': date_str,
-            **gross_profit_data
-        }
-        all_data.append(complete_data)
+    # Each PDF is independent, so fan the extraction out across cores;
+    # PyMuPDF parsing dominates and parallelizes cleanly in processes
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        all_data = list(executor.map(_process_one, map(str, gross_profit_files), chunksize=4))
 
     output_file = Path("gross_profit_extracted_data.json")
-    with open(output_file, 'w') as f:
-        json.dump(all_data, f, indent=2, default=str)
+    dump_json(output_file, all_data)
 
 if __name__ == "__main__":
     process_all_gross_profit_reports() 
\ No newline at end of file
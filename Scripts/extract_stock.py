@@ -1,6 +1,6 @@
+import csv
 import fitz  # PyMuPDF
 import re
-import pandas as pd
 
 # Step 1: Load the PDF
 doc = fitz.open("/mnt/data/20250716-11h36m16s-Complete.pdf")
@@ -50,6 +50,10 @@ for line in cleaned_lines:
             "GrossProfitPercent": float(gp_pct)
         })
 
-# Step 5: Convert to DataFrame and export
-df = pd.DataFrame(records)
-df.to_csv("/mnt/data/full_sales_breakdown.csv", index=False)
\ No newline at end of file
+# Step 5: Write the CSV directly - no DataFrame construction or dtype
+# inference just to serialize a list of dicts
+if records:
+    with open("/mnt/data/full_sales_breakdown.csv", "w", newline="") as fh:
+        writer = csv.DictWriter(fh, fieldnames=list(records[0].keys()))
+        writer.writeheader()
+        writer.writerows(records)
\ No newline at end of file
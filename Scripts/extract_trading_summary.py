@@ -1,5 +1,7 @@
 import fitz  # PyMuPDF
+import functools
 import re
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, Optional, Any
@@ -10,9 +12,76 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from database_connection import PharmacyDatabase
 
-def extract_trading_summary_data(pdf_path: str) -> Dict[str, Any]:
+# Patterns compiled once at import so per-PDF calls skip re-compilation
+# and the re module's internal cache entirely. Gaps between the label
+# and its number are bounded [\s\S]{0,120}? spans rather than unbounded
+# DOTALL .*?: a label whose number never follows stops backtracking
+# after ~a line or two instead of walking the whole document, while a
+# value that PyMuPDF emits on the following line still matches
+_TRADING_PATTERNS = {
+    field: [re.compile(p, re.IGNORECASE) for p in field_patterns]
+    for field, field_patterns in {
+        'turnover': [
+            r'SALES[\s\S]{0,120}?RETAIL[\s\S]{0,120}?(\d{1,3}(?:,\d{3})*\.\d{2})',
+            r'SALES[\s\S]{0,120}?STKTRN[\s\S]{0,120}?(\d{1,3}(?:,\d{3})*\.\d{2})'
+        ],
+        'stock_opening': [
+            r'OPENING STOCK[\s\S]{0,120}?(\d{1,3}(?:,\d{3})*\.\d{2})',
+            r'OPENING STOCK[\s\S]{0,120}?START DATE[\s\S]{0,120}?(\d{1,3}(?:,\d{3})*\.\d{2})'
+        ],
+        'purchases': [
+            r'PURCHASES[\s\S]{0,120}?(\d{1,3}(?:,\d{3})*\.\d{2})',
+            r'\+\s*PURCHASES[\s\S]{0,120}?(\d{1,3}(?:,\d{3})*\.\d{2})'
+        ],
+        'adjustments': [
+            r'ADJUSTMENTS[\s\S]{0,120}?(\d{1,3}(?:,\d{3})*\.\d{2})',
+            r'\+\s*ADJUSTMENTS[\s\S]{0,120}?(\d{1,3}(?:,\d{3})*\.\d{2})'
+        ],
+        'stock_closing': [
+            r'CLOSING STOCK[\s\S]{0,120}?(\d{1,3}(?:,\d{3})*\.\d{2})',
+            r'CLOSING STOCK[\s\S]{0,120}?END DATE[\s\S]{0,120}?(\d{1,3}(?:,\d{3})*\.\d{2})'
+        ],
+        'cost_of_sales': [
+            r'COST OF SALES[\s\S]{0,120}?(\d{1,3}(?:,\d{3})*\.\d{2})',
+            r'COST OF GOODS SOLD[\s\S]{0,120}?(\d{1,3}(?:,\d{3})*\.\d{2})'
+        ],
+        'gp_value': [
+            r'GROSS PROFIT FROM TRADING[\s\S]{0,120}?(\d{1,3}(?:,\d{3})*\.\d{2})',
+            r'= GROSS PROFIT FROM TRADING[\s\S]{0,120}?(\d{1,3}(?:,\d{3})*\.\d{2})'
+        ],
+        'gp_percent': [
+            r'GROSS PROFIT AS A PERCENTAGE[\s\S]{0,120}?=\s*(\d+\.\d{2})',
+            r'PERCENTAGE OF RETAIL SALES[\s\S]{0,120}?=\s*(\d+\.\d{2})'
+        ]
+    }.items()
+}
+
+# Pharmacy markers as one literal alternation: a single scan over the
+# first page instead of one substring pass per marker. The dict maps the
+# matched marker to the canonical pharmacy name
+_PHARMACY_RE = re.compile(r"REITZ|WINTERTON|TLC")
+_PHARMACY_NAMES = {
+    "REITZ": "REITZ",
+    "WINTERTON": "TLC WINTERTON",
+    "TLC": "TLC WINTERTON",
+}
+
+# First-page date ranges (page text is uppercased before matching)
+_DATE_PATTERNS = tuple(re.compile(p) for p in [
+    r'FROM:\s*(\d{4})/(\d{1,2})/(\d{1,2})\s+TO:\s*(\d{4})/(\d{1,2})/(\d{1,2})',
+    r'(\d{4})/(\d{1,2})/(\d{1,2})\s*-\s*(\d{4})/(\d{1,2})/(\d{1,2})'
+])
+
+# Fallback date sources: classifier folder name and YYYYMMDD in filename
+_FOLDER_DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
+_FILENAME_DATE_RE = re.compile(r"(20\d{6})")
+
+def extract_trading_summary_data(pdf_path: str, text: Optional[str] = None) -> Dict[str, Any]:
     """
     Extract trading summary data from a PDF file
+
+    If the caller already holds the document's text, pass it via `text`
+    to skip re-opening and re-parsing the PDF.
     
     Returns a dictionary with the extracted data that matches the database schema:
     - stock_opening: Opening stock value
@@ -25,15 +94,6 @@ def extract_trading_summary_data(pdf_path: str) -> Dict[str, Any]:
     - turnover: Sales/turnover value
     """
     
-    doc = fitz.open(pdf_path)
-    text = ""
-    
-    # Extract text from all pages
-    for page_num in range(len(doc)):
-        text += doc[page_num].get_text()
-    
-    doc.close()
-    
     # Initialize result dictionary
     result = {
         'stock_opening': None,
@@ -45,47 +105,35 @@ def extract_trading_summary_data(pdf_path: str) -> Dict[str, Any]:
         'gp_percent': None,
         'turnover': None
     }
-    
-    # Define regex patterns for each field
-    patterns = {
-        'turnover': [
-            r'SALES.*?RETAIL.*?(\d{1,3}(?:,\d{3})*\.\d{2})',
-            r'SALES.*?STKTRN.*?(\d{1,3}(?:,\d{3})*\.\d{2})'
-        ],
-        'stock_opening': [
-            r'OPENING STOCK.*?(\d{1,3}(?:,\d{3})*\.\d{2})',
-            r'OPENING STOCK.*?START DATE.*?(\d{1,3}(?:,\d{3})*\.\d{2})'
-        ],
-        'purchases': [
-            r'PURCHASES.*?(\d{1,3}(?:,\d{3})*\.\d{2})',
-            r'\+\s*PURCHASES.*?(\d{1,3}(?:,\d{3})*\.\d{2})'
-        ],
-        'adjustments': [
-            r'ADJUSTMENTS.*?(\d{1,3}(?:,\d{3})*\.\d{2})',
-            r'\+\s*ADJUSTMENTS.*?(\d{1,3}(?:,\d{3})*\.\d{2})'
-        ],
-        'stock_closing': [
-            r'CLOSING STOCK.*?(\d{1,3}(?:,\d{3})*\.\d{2})',
-            r'CLOSING STOCK.*?END DATE.*?(\d{1,3}(?:,\d{3})*\.\d{2})'
-        ],
-        'cost_of_sales': [
-            r'COST OF SALES.*?(\d{1,3}(?:,\d{3})*\.\d{2})',
-            r'COST OF GOODS SOLD.*?(\d{1,3}(?:,\d{3})*\.\d{2})'
-        ],
-        'gp_value': [
-            r'GROSS PROFIT FROM TRADING.*?(\d{1,3}(?:,\d{3})*\.\d{2})',
-            r'= GROSS PROFIT FROM TRADING.*?(\d{1,3}(?:,\d{3})*\.\d{2})'
-        ],
-        'gp_percent': [
-            r'GROSS PROFIT AS A PERCENTAGE.*?=\s*(\d+\.\d{2})',
-            r'PERCENTAGE OF RETAIL SALES.*?=\s*(\d+\.\d{2})'
-        ]
-    }
-    
-    # Extract each field using regex patterns
-    for field, field_patterns in patterns.items():
+
+    if text is not None:
+        _extract_trading_fields(text, result)
+        return result
+
+    # Stream pages and stop once every field has matched - the whole
+    # summary normally sits on page 1, so later pages usually never need
+    # text extraction. Pages accumulate in a list joined per attempt
+    # rather than via quadratic string concatenation.
+    doc = fitz.open(pdf_path)
+    parts = []
+    try:
+        for page in doc:
+            parts.append(page.get_text("text", sort=False))
+            if _extract_trading_fields(''.join(parts), result):
+                break
+    finally:
+        doc.close()
+
+    return result
+
+def _extract_trading_fields(text: str, result: Dict[str, Any]) -> bool:
+    """Fill still-missing fields in result from text; True when all are found"""
+    complete = True
+    for field, field_patterns in _TRADING_PATTERNS.items():
+        if result[field] is not None:
+            continue
         for pattern in field_patterns:
-            match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
+            match = pattern.search(text)
             if match:
                 try:
                     value_str = match.group(1).replace(',', '')
@@ -93,34 +141,43 @@ def extract_trading_summary_data(pdf_path: str) -> Dict[str, Any]:
                     break  # Stop after first successful match for this field
                 except (ValueError, IndexError):
                     continue
-    
-    return result
+        if result[field] is None:
+            complete = False
+    return complete
 
-def extract_pharmacy_and_date(pdf_path: str) -> tuple[str, str]:
+@functools.lru_cache(maxsize=256)
+def _first_page_text(pdf_path: str, mtime: float) -> str:
+    """First page's plain text, memoized per (path, mtime)
+
+    Reruns over the same unchanged files skip the fitz open entirely;
+    the mtime in the key invalidates the entry when a file is replaced.
+    """
+    doc = fitz.open(pdf_path)
+    try:
+        return doc[0].get_text("text", sort=False)
+    finally:
+        doc.close()
+
+def extract_pharmacy_and_date(pdf_path: str, text: Optional[str] = None) -> tuple[str, str]:
     """
     Extract pharmacy name and date from the PDF
     Returns tuple of (pharmacy_name, date_string)
+
+    If the caller already holds the first page's text, pass it via
+    `text` to skip re-opening and re-parsing the PDF.
     """
-    doc = fitz.open(pdf_path)
-    text = doc[0].get_text().upper()  # Get first page text
-    doc.close()
-    
-    # Extract pharmacy name
-    pharmacy_name = "UNKNOWN"
-    if "REITZ" in text:
-        pharmacy_name = "REITZ"
-    elif "WINTERTON" in text or "TLC" in text:
-        pharmacy_name = "TLC WINTERTON"
-    
+    if text is None:
+        text = _first_page_text(pdf_path, os.path.getmtime(pdf_path))
+    text = text.upper()
+
+    # Extract pharmacy name - one alternation scan, dict dispatch
+    match = _PHARMACY_RE.search(text)
+    pharmacy_name = _PHARMACY_NAMES[match.group(0)] if match else "UNKNOWN"
+
     # Extract date
-    date_patterns = [
-        r'FROM:\s*(\d{4})/(\d{1,2})/(\d{1,2})\s+TO:\s*(\d{4})/(\d{1,2})/(\d{1,2})',
-        r'(\d{4})/(\d{1,2})/(\d{1,2})\s*-\s*(\d{4})/(\d{1,2})/(\d{1,2})'
-    ]
-    
     date_str = None
-    for pattern in date_patterns:
-        match = re.search(pattern, text)
+    for pattern in _DATE_PATTERNS:
+        match = pattern.search(text)
         if match:
             # Use the end date (last 3 values)
             if len(match.groups()) == 6:
@@ -135,51 +192,61 @@ def extract_pharmacy_and_date(pdf_path: str) -> tuple[str, str]:
         try:
             from pathlib import Path
             possible_date = Path(pdf_path).parent.parent.name
-            if re.match(r"\d{4}-\d{2}-\d{2}", possible_date):
+            if _FOLDER_DATE_RE.match(possible_date):
                 date_str = possible_date
         except Exception:
             pass
     if date_str is None:
-        m = re.search(r"(20\d{6})", Path(pdf_path).name)
+        m = _FILENAME_DATE_RE.search(Path(pdf_path).name)
         if m:
             raw = m.group(1)
             date_str = f"{raw[:4]}-{raw[4:6]}-{raw[6:8]}"
     
     return pharmacy_name, date_str
 
+def _process_one(pdf_path: str) -> Dict[str, Any]:
+    """Extract everything from a single trading summary PDF (worker for the process pool)"""
+    # Open and parse the document once, then feed both extraction steps
+    # from the collected page text
+    doc = fitz.open(pdf_path)
+    page_texts = [page.get_text("text", sort=False) for page in doc]
+    doc.close()
+
+    pharmacy_name, date_str = extract_pharmacy_and_date(
+        pdf_path, text=page_texts[0] if page_texts else '')
+    trading_data = extract_trading_summary_data(pdf_path, text=''.join(page_texts))
+
+    return {
+        'file': Path(pdf_path).name,
+        'pharmacy': pharmacy_name,
+        'date': date_str,
+        **trading_data
+    }
+
 def process_all_trading_summaries(base_dir: str = "../temp_classified_pdfs"):
     """
     Process all trading summary files in the classified PDFs directory
     """
     import json
     base_path = Path(base_dir)
-    
+
     if not base_path.exists():
         print(f"Directory not found: {base_path}")
         return
-    
+
     trading_files = list(base_path.rglob("trading_summary_*.pdf"))
-    
+
     if not trading_files:
         print("No trading summary files found")
         return
-    
+
     print(f"Found {len(trading_files)} trading summary files")
-    
-    all_data = []
-    
-    for pdf_file in trading_files:
-        pharmacy_name, date_str = extract_pharmacy_and_date(str(pdf_file))
-        trading_data = extract_trading_summary_data(str(pdf_file))
-        
-        complete_data = {
-            'file': pdf_file.name,
-            'pharmacy': pharmacy_name,
-            'date': date_str,
-            **trading_data
-        }
-        all_data.append(complete_data)
-        
+
+    # Each PDF is independent, so fan the extraction out across cores;
+    # PyMuPDF parsing dominates and parallelizes cleanly in processes
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        all_data = list(executor.map(_process_one, map(str, trading_files), chunksize=4))
+
     output_file = Path("trading_summary_extracted_data.json")
     with open(output_file, 'w') as f:
         json.dump(all_data, f, indent=2, default=str)
@@ -1,89 +1,110 @@
 import fitz  # PyMuPDF
+import functools
+import logging
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, Optional, Any
 import json
 
+import extract_cache
+from report_common import (
+    DATE_RANGE_RE, detect_pharmacy, dump_json, fallback_date, first_page_text,
+    format_currency, list_reports, parse_end_date
+)
+
+logger = logging.getLogger(__name__)
+
+# All date-range label variants are folded into the shared unified
+# pattern: one search per file instead of up to five
+_DATE_PATTERNS = (DATE_RANGE_RE,)
+
+# TOTAL TURNOVER line: Gross, Disc, Nett Exclusive columns
+_TURNOVER_RE = re.compile(
+    r'\*\*\s*TOTAL TURNOVER\s+(\d{1,3}(?:,\d{3})*\.\d{2})\s+'
+    r'(\d{1,3}(?:,\d{3})*\.\d{2}[-]?)\s+(\d{1,3}(?:,\d{3})*\.\d{2})',
+    re.IGNORECASE
+)
+
+# Docket types whose Accno column counts toward the transaction total
+# (excluding PAID OUT), fused into one alternation: a single finditer
+# pass over the whole text replaces the per-line loop that ran a
+# separate search per docket type. Longer literals sit before their
+# prefixes (RECEIPT COD before RECEIPT, SCRIPT REFUND before SCRIPT) so
+# the more specific type wins. [^\n]*? keeps the captured Accno value on
+# the same line as the docket type.
+_DOCKET_RE = re.compile(
+    r'(CASH SALE|C\.O\.D SALE|INVOICE|CASH REFUND|CREDIT NOTE|'
+    r'RECEIPT COD|RECEIPT|SCRIPT REFUND|SCRIPT|MEDICAL AIDS|'
+    r'LEVY DEBITS|LEVY CREDITS)[^\n]*?(\d+)',
+    re.IGNORECASE
+)
+
+@functools.lru_cache(maxsize=1)
+def _build_turnover_index(base_dir: str) -> Dict[tuple, Optional[float]]:
+    """Map (pharmacy, date) to its turnover value in one walk
+
+    Built once per base_dir and memoized. Pharmacy, date and the
+    TOTAL TURNOVER value all come from a single first-page text per
+    file, so lookups are pure dict reads with no reopening or
+    re-matching.
+    """
+    index = {}
+    for pdf_file in list_reports(base_dir, "turnover_summary_"):
+        text = first_page_text(str(pdf_file))
+
+        pharmacy = detect_pharmacy(text)
+        file_date = parse_end_date(text, _DATE_PATTERNS)
+        if file_date is None:
+            continue
+
+        # TOTAL TURNOVER line, 3rd number (Nett Exclusive)
+        turnover = None
+        match = _TURNOVER_RE.search(text)
+        if match:
+            try:
+                turnover = float(match.group(3).replace(',', ''))
+            except ValueError:
+                pass
+
+        # First parsable value wins; a file with no readable TOTAL
+        # TURNOVER line must not pin None for its key while a later
+        # file could still supply the value
+        if turnover is not None:
+            index.setdefault((pharmacy, file_date), turnover)
+    return index
+
 def extract_turnover_from_turnover_summary(pharmacy_name: str, date_str: str, base_dir: str = "../temp_classified_pdfs") -> Optional[float]:
     """
     Extract turnover value from turnover summary report for the given pharmacy and date
     """
-    base_path = Path(base_dir)
-    
-    # Look for turnover summary file for this pharmacy and date
-    turnover_files = list(base_path.rglob(f"turnover_summary_*.pdf"))
-    
-    for pdf_file in turnover_files:
-        # Check if this file is for the correct pharmacy and date
-        doc = fitz.open(str(pdf_file))
-        text = doc[0].get_text().upper()
-        doc.close()
-        
-        # Check pharmacy
-        if pharmacy_name == "REITZ" and "REITZ" not in text:
-            continue
-        if pharmacy_name == "TLC WINTERTON" and ("WINTERTON" not in text and "TLC" not in text):
-            continue
-            
-        # Check date
-        date_patterns = [
-            r'from:\s*(\d{4})/(\d{1,2})/(\d{1,2})\s+to:\s*(\d{4})/(\d{1,2})/(\d{1,2})',
-            r'(\d{4})/(\d{1,2})/(\d{1,2})\s*-\s*(\d{4})/(\d{1,2})/(\d{1,2})',
-            r'range.*from:\s*(\d{4})/(\d{1,2})/(\d{1,2})\s+to:\s*(\d{4})/(\d{1,2})/(\d{1,2})',
-            r'period.*from:\s*(\d{4})/(\d{1,2})/(\d{1,2})\s+to:\s*(\d{4})/(\d{1,2})/(\d{1,2})',
-            r'date from\s*:\s*(\d{4})/(\d{1,2})/(\d{1,2})\s+date to\s*:\s*(\d{4})/(\d{1,2})/(\d{1,2})'
-        ]
-        
-        file_date = None
-        for pattern in date_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                if len(match.groups()) == 6:
-                    year, month, day = match.group(4), match.group(5), match.group(6)
-                else:
-                    year, month, day = match.group(1), match.group(2), match.group(3)
-                file_date = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-                break
-        
-        if file_date == date_str:
-            # Extract turnover from this file
-            doc = fitz.open(str(pdf_file))
-            text = doc[0].get_text()
-            doc.close()
-            
-            # Look for TOTAL TURNOVER line with 3rd number (Nett Exclusive)
-            turnover_pattern = r'\*\*\s*TOTAL TURNOVER\s+(\d{1,3}(?:,\d{3})*\.\d{2})\s+(\d{1,3}(?:,\d{3})*\.\d{2}[-]?)\s+(\d{1,3}(?:,\d{3})*\.\d{2})'
-            match = re.search(turnover_pattern, text, re.IGNORECASE)
-            
-            if match:
-                try:
-                    turnover_str = match.group(3).replace(',', '')
-                    return float(turnover_str)
-                except ValueError:
-                    continue
-    
-    return None
+    return _build_turnover_index(base_dir).get((pharmacy_name, date_str))
 
-def extract_transaction_summary_data(pdf_path: str) -> Dict[str, Any]:
+def extract_transaction_summary_data(pdf_path: str, text: Optional[str] = None,
+                                     verbose: bool = False) -> Dict[str, Any]:
     """
     Extract transaction summary data from a PDF file
-    
+
+    If the caller already holds the document's text, pass it via `text`
+    to skip re-opening and re-parsing the PDF. Set `verbose` to log each
+    matched docket line; quiet by default so stdout writes don't
+    serialize the process-pool workers.
+
     Returns a dictionary with the extracted data:
     - transactions_total: Total transaction count (sum of all Accno values, excluding PAID OUT)
     - transaction_breakdown: Breakdown by transaction type (excluding PAID OUT)
     - avg_basket_value: Calculated average basket value (turnover / transactions)
     """
     
-    doc = fitz.open(pdf_path)
-    text = ""
-    
-    # Extract text from all pages
-    for page_num in range(len(doc)):
-        text += doc[page_num].get_text()
-    
-    doc.close()
-    
+    if text is None:
+        # Extract text from all pages; a single join sized from the part
+        # lengths replaces the quadratic += concatenation, and iterating
+        # the document directly avoids per-page index lookups
+        with fitz.open(pdf_path) as doc:
+            text = ''.join(page.get_text("text", sort=False) for page in doc)
+
     # Initialize result dictionary
     result = {
         'transactions_total': 0,
@@ -91,46 +112,25 @@ def extract_transaction_summary_data(pdf_path: str) -> Dict[str, Any]:
         'avg_basket_value': None
     }
     
-    # Split text into lines and process each line
-    lines = text.split('\n')
+    # One alternation pass over the whole text: each match carries the
+    # docket type and the Accno value (transaction count) from its line
     total_transactions = 0
-    
-    for line in lines:
-        # Look for lines that contain transaction data
-        # Pattern: DOCKET TYPE followed by numbers in the Accno column
-        # We're looking for lines that have a docket type and a number in the Accno position
-        
-        # Common docket types to look for (excluding PAID OUT)
-        docket_types = [
-            'CASH SALE', 'C.O.D SALE', 'INVOICE', 'CASH REFUND', 
-            'CREDIT NOTE', 'RECEIPT', 'RECEIPT COD',
-            'SCRIPT', 'SCRIPT REFUND', 'MEDICAL AIDS', 'LEVY DEBITS',
-            'LEVY CREDITS'
-        ]
-        
-        for docket_type in docket_types:
-            if docket_type in line.upper():
-                # Try to extract the Accno value (transaction count)
-                # The Accno is typically a number in the 3rd or 4th column
-                # Pattern: look for a number after the docket type
-                accno_pattern = rf'{docket_type}.*?(\d+)'
-                match = re.search(accno_pattern, line, re.IGNORECASE)
-                
-                if match:
-                    try:
-                        accno_value = int(match.group(1))
-                        total_transactions += accno_value
-                        
-                        # Store breakdown by docket type
-                        if docket_type not in result['transaction_breakdown']:
-                            result['transaction_breakdown'][docket_type] = 0
-                        result['transaction_breakdown'][docket_type] += accno_value
-                        
-                        print(f"  Found {docket_type}: {accno_value} transactions")
-                    except ValueError:
-                        continue
-                break
-    
+    breakdown = result['transaction_breakdown']
+
+    for match in _DOCKET_RE.finditer(text):
+        docket_type = match.group(1).upper()
+        try:
+            accno_value = int(match.group(2))
+        except ValueError:
+            continue
+        total_transactions += accno_value
+
+        # Store breakdown by docket type
+        breakdown[docket_type] = breakdown.get(docket_type, 0) + accno_value
+
+        if verbose:
+            logger.debug("Found %s: %s transactions", docket_type, accno_value)
+
     result['transactions_total'] = total_transactions
     return result
 
@@ -139,59 +139,27 @@ def extract_pharmacy_and_date(pdf_path: str) -> tuple[str, str]:
     Extract pharmacy name and date from the PDF
     Returns tuple of (pharmacy_name, date_string)
     """
-    doc = fitz.open(pdf_path)
-    text = doc[0].get_text().upper()  # Get first page text
-    doc.close()
-    
-    # Extract pharmacy name
-    pharmacy_name = "UNKNOWN"
-    if "REITZ" in text:
-        pharmacy_name = "REITZ"
-    elif "WINTERTON" in text or "TLC" in text:
-        pharmacy_name = "TLC WINTERTON"
-    
-    # Extract date
-    date_patterns = [
-        r'from:\s*(\d{4})/(\d{1,2})/(\d{1,2})\s+to:\s*(\d{4})/(\d{1,2})/(\d{1,2})',
-        r'(\d{4})/(\d{1,2})/(\d{1,2})\s*-\s*(\d{4})/(\d{1,2})/(\d{1,2})',
-        r'range.*from:\s*(\d{4})/(\d{1,2})/(\d{1,2})\s+to:\s*(\d{4})/(\d{1,2})/(\d{1,2})',
-        r'period.*from:\s*(\d{4})/(\d{1,2})/(\d{1,2})\s+to:\s*(\d{4})/(\d{1,2})/(\d{1,2})',
-        r'date from\s*:\s*(\d{4})/(\d{1,2})/(\d{1,2})\s+date to\s*:\s*(\d{4})/(\d{1,2})/(\d{1,2})'
-    ]
-    
-    date_str = None
-    for pattern in date_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            # Use the end date (last 3 values)
-            if len(match.groups()) == 6:
-                year, month, day = match.group(4), match.group(5), match.group(6)
-            else:
-                year, month, day = match.group(1), match.group(2), match.group(3)
-            date_str = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-            break
+    text = first_page_text(pdf_path)  # Memoized per (path, mtime)
 
+    pharmacy_name = detect_pharmacy(text)
+
+    date_str = parse_end_date(text, _DATE_PATTERNS)
     if date_str is None:
-        from pathlib import Path
-        possible_date = Path(pdf_path).parent.parent.name
-        if re.match(r"\d{4}-\d{2}-\d{2}", possible_date):
-            date_str = possible_date
-    if date_str is None:
-        m = re.search(r"(20\d{6})", Path(pdf_path).name)
-        if m:
-            raw=m.group(1)
-            date_str=f"{raw[:4]}-{raw[4:6]}-{raw[6:8]}"
-    
+        date_str = fallback_date(pdf_path)
+
     return pharmacy_name, date_str
 
-def format_currency(amount: float) -> str:
-    """Format amount as currency with commas"""
-    if amount is None:
-        return "N/A"
-    elif amount < 0:
-        return f"-R{abs(amount):,.2f}"
-    else:
-        return f"R{amount:,.2f}"
+def _process_one(pdf_path: str) -> Dict[str, Any]:
+    """Extract everything from a single transaction summary PDF (worker for the process pool)"""
+    pharmacy_name, date_str = extract_pharmacy_and_date(pdf_path)
+    transaction_data = extract_transaction_summary_data(pdf_path)
+
+    return {
+        'file': Path(pdf_path).name,
+        'pharmacy': pharmacy_name,
+        'date': date_str,
+        **transaction_data
+    }
 
 def process_all_transaction_summaries(base_dir: str = "../temp_classified_pdfs"):
     """
@@ -199,36 +167,55 @@ def process_all_transaction_summaries(base_dir: str = "../temp_classified_pdfs")
     """
     import json
     base_path = Path(base_dir)
-    
+
     if not base_path.exists():
         print(f"Directory not found: {base_path}")
         return
-        
-    transaction_files = list(base_path.rglob("transaction_summary_*.pdf"))
-    
+
+    transaction_files = list_reports(base_dir, "transaction_summary_")
+
     if not transaction_files:
         print("No transaction summary files found")
         return
 
     print(f"Found {len(transaction_files)} transaction summary files")
 
+    # The turnover index memoizes a whole tree walk; the email monitor
+    # replaces that tree between in-process pipeline runs, so rebuild
+    # it fresh each run rather than answering from a deleted tree
+    _build_turnover_index.cache_clear()
+
+    # Sidecar cache keyed on (name, size, mtime): unchanged PDFs skip
+    # extraction entirely on reruns, which is the common case on a cron
+    cache_path = Path("transaction_summary_cache.json")
+    cache = extract_cache.load_cache(cache_path)
+
     all_data = []
-    
+    to_process = []
+    fresh_cache = {}
     for pdf_file in transaction_files:
-        pharmacy_name, date_str = extract_pharmacy_and_date(str(pdf_file))
-        transaction_data = extract_transaction_summary_data(str(pdf_file))
-        
-        complete_data = {
-            'file': pdf_file.name,
-            'pharmacy': pharmacy_name,
-            'date': date_str,
-            **transaction_data
-        }
-        all_data.append(complete_data)
-        
+        key = extract_cache.file_key(pdf_file)
+        if key in cache:
+            fresh_cache[key] = cache[key]
+            all_data.append(cache[key])
+        else:
+            to_process.append((key, pdf_file))
+
+    if to_process:
+        # Each PDF is independent, so fan the extraction out across cores;
+        # PyMuPDF parsing dominates and parallelizes cleanly in processes
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+            results = list(executor.map(
+                _process_one, (str(p) for _, p in to_process), chunksize=4))
+        for (key, _), result in zip(to_process, results):
+            fresh_cache[key] = result
+            all_data.append(result)
+
+    # Persist only keys seen this run so stale entries age out
+    extract_cache.save_cache(cache_path, fresh_cache)
+
     output_file = Path("transaction_summary_extracted_data.json")
-    with open(output_file, 'w') as f:
-        json.dump(all_data, f, indent=2, default=str)
+    dump_json(output_file, all_data)
 
 if __name__ == "__main__":
     process_all_transaction_summaries() 
\ No newline at end of file
@@ -1,43 +1,26 @@
 import fitz  # PyMuPDF
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, Optional, Any
 import json
 
-def extract_turnover_summary_data(pdf_path: str) -> Dict[str, Any]:
-    """
-    Extract turnover summary data from a PDF file
-    
-    Returns a dictionary with the extracted data that matches the database schema:
-    - turnover: Total turnover (Nett Exclusive) - This will override trading summary turnover
-    - sales_cash: Cash sales (Nett Exclusive)
-    - sales_account: Account sales (Nett Exclusive)  
-    - sales_cod: COD sales (Nett Exclusive)
-    """
-    
-    doc = fitz.open(pdf_path)
-    text = ""
-    
-    # Extract text from all pages
-    for page_num in range(len(doc)):
-        text += doc[page_num].get_text()
-    
-    doc.close()
-    
-    # Initialize result dictionary
-    result = {
-        'turnover': None,
-        'sales_cash': None,
-        'sales_account': None,
-        'sales_cod': None,
-        'type_r_sales': None
-    }
-    
-    # Define regex patterns for each field (focusing on Nett Excl column - 3rd number)
-    # Format: Gross + Disc = Nett + VAT = Nett Count Average
-    #         [1st]  [2nd]  [3rd] [4th]  [5th] [6th] [7th]
-    patterns = {
+import extract_cache
+from report_common import (
+    DATE_RANGE_RE, detect_pharmacy, dump_json, fallback_date, first_page_text,
+    format_currency, list_reports, parse_end_date
+)
+
+# Patterns compiled once at import so per-file calls skip re-compilation
+# and the re module's internal cache entirely.
+# Each field focuses on the Nett Excl column (3rd number).
+# Format: Gross + Disc = Nett + VAT = Nett Count Average
+#         [1st]  [2nd]  [3rd] [4th]  [5th] [6th] [7th]
+_TURNOVER_PATTERNS = {
+    field: [re.compile(p, re.IGNORECASE | re.DOTALL) for p in field_patterns]
+    for field, field_patterns in {
         'turnover': [
             # Match TOTAL TURNOVER line with 3rd number (Nett Exclusive)
             r'\*\*\s*TOTAL TURNOVER\s+(\d{1,3}(?:,\d{3})*\.\d{2})\s+(\d{1,3}(?:,\d{3})*\.\d{2}[-]?)\s+(\d{1,3}(?:,\d{3})*\.\d{2})',
@@ -69,12 +52,54 @@ def extract_turnover_summary_data(pdf_path: str) -> Dict[str, Any]:
             # Match ** 'R' TOTALS row (numbers may be on same line)
             r"\*\*\s*['’]?\s*R\s*['’]?\s*TOTALS\s+(\d{1,3}(?:,\d{3})*\.\d{2})\s+(\d{1,3}(?:,\d{3})*\.\d{2}-?)\s+(\d{1,3}(?:,\d{3})*\.\d{2})"
         ]
+    }.items()
+}
+
+# Both first-page date-range forms are branches of the shared unified
+# pattern: one search per file instead of two
+_DATE_PATTERNS = (DATE_RANGE_RE,)
+
+def extract_turnover_summary_data(pdf_path: str, text: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Extract turnover summary data from a PDF file
+
+    If the caller already holds the document's text, pass it via `text`
+    to skip re-opening and re-parsing the PDF.
+    
+    Returns a dictionary with the extracted data that matches the database schema:
+    - turnover: Total turnover (Nett Exclusive) - This will override trading summary turnover
+    - sales_cash: Cash sales (Nett Exclusive)
+    - sales_account: Account sales (Nett Exclusive)  
+    - sales_cod: COD sales (Nett Exclusive)
+    """
+    
+    if text is None:
+        # Stream pages and stop once the grand-total line has appeared -
+        # these summaries normally fit on page 1, so later pages rarely
+        # need text extraction. Pages accumulate in a list joined once
+        # rather than via quadratic string concatenation.
+        parts = []
+        with fitz.open(pdf_path) as doc:
+            for page in doc:
+                page_text = page.get_text("text", sort=False)
+                parts.append(page_text)
+                if 'TOTAL TURNOVER' in page_text.upper():
+                    break
+        text = ''.join(parts)
+
+    # Initialize result dictionary
+    result = {
+        'turnover': None,
+        'sales_cash': None,
+        'sales_account': None,
+        'sales_cod': None,
+        'type_r_sales': None
     }
     
-    # Extract each field using regex patterns
-    for field, field_patterns in patterns.items():
+    # Extract each field using the precompiled patterns
+    for field, field_patterns in _TURNOVER_PATTERNS.items():
         for i, pattern in enumerate(field_patterns):
-            match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
+            match = pattern.search(text)
             if match:
                 try:
                     if field in ('turnover', 'type_r_sales'):
@@ -117,60 +142,27 @@ def extract_pharmacy_and_date(pdf_path: str) -> tuple[str, str]:
     Extract pharmacy name and date from the PDF
     Returns tuple of (pharmacy_name, date_string)
     """
-    doc = fitz.open(pdf_path)
-    text = doc[0].get_text().upper()  # Get first page text
-    doc.close()
-    
-    # Extract pharmacy name
-    pharmacy_name = "UNKNOWN"
-    if "REITZ" in text:
-        pharmacy_name = "REITZ"
-    elif "WINTERTON" in text or "TLC" in text:
-        pharmacy_name = "TLC WINTERTON"
-    
-    # Extract date
-    date_patterns = [
-        r'FROM:\s*(\d{4})/(\d{1,2})/(\d{1,2})\s+TO:\s*(\d{4})/(\d{1,2})/(\d{1,2})',
-        r'(\d{4})/(\d{1,2})/(\d{1,2})\s*-\s*(\d{4})/(\d{1,2})/(\d{1,2})'
-    ]
-    
-    date_str = None
-    for pattern in date_patterns:
-        match = re.search(pattern, text)
-        if match:
-            # Use the end date (last 3 values)
-            if len(match.groups()) == 6:
-                year, month, day = match.group(4), match.group(5), match.group(6)
-            else:
-                year, month, day = match.group(1), match.group(2), match.group(3)
-            date_str = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-            break
-    
-    if date_str is None:
-        # Fallback 1 ─ pick the <date> folder two levels up created by classifier
-        try:
-            possible_date = Path(pdf_path).parent.parent.name  # e.g. 2025-08-05
-            if re.match(r"\d{4}-\d{2}-\d{2}", possible_date):
-                date_str = possible_date
-        except Exception:
-            pass
+    text = first_page_text(pdf_path)  # Memoized per (path, mtime)
+
+    pharmacy_name = detect_pharmacy(text)
+
+    date_str = parse_end_date(text, _DATE_PATTERNS)
     if date_str is None:
-        # Fallback 2 ─ look for YYYYMMDD inside the filename
-        m = re.search(r"(20\d{6})", Path(pdf_path).name)
-        if m:
-            raw = m.group(1)            # 20250805
-            date_str = f"{raw[:4]}-{raw[4:6]}-{raw[6:8]}"
-    
+        date_str = fallback_date(pdf_path)
+
     return pharmacy_name, date_str
 
-def format_currency(amount: float) -> str:
-    """Format amount as currency with commas"""
-    if amount is None:
-        return "N/A"
-    elif amount < 0:
-        return f"-R{abs(amount):,.2f}"
-    else:
-        return f"R{amount:,.2f}"
+def _process_one(pdf_path: str) -> Dict[str, Any]:
+    """Extract everything from a single turnover summary PDF (worker for the process pool)"""
+    pharmacy_name, date_str = extract_pharmacy_and_date(pdf_path)
+    turnover_data = extract_turnover_summary_data(pdf_path)
+
+    return {
+        'file': Path(pdf_path).name,
+        'pharmacy': pharmacy_name,
+        'date': date_str,
+        **turnover_data
+    }
 
 def process_all_turnover_summaries(base_dir: str = "../temp_classified_pdfs"):
     """
@@ -178,38 +170,52 @@ def process_all_turnover_summaries(base_dir: str = "../temp_classified_pdfs"):
     """
     import json
     base_path = Path(base_dir)
-    
+
     if not base_path.exists():
         print(f"Directory not found: {base_path}")
         return
-    
+
     # Find all turnover summary files
-    turnover_files = list(base_path.rglob("turnover_summary_*.pdf"))
-    
+    turnover_files = list_reports(base_dir, "turnover_summary_")
+
     if not turnover_files:
         print("No turnover summary files found")
         return
-    
+
     print(f"Found {len(turnover_files)} turnover summary files")
-    
+
+    # Sidecar cache keyed on (name, size, mtime): unchanged PDFs skip
+    # extraction entirely on reruns, which is the common case on a cron
+    cache_path = Path("turnover_summary_cache.json")
+    cache = extract_cache.load_cache(cache_path)
+
     all_data = []
-    
+    to_process = []
+    fresh_cache = {}
     for pdf_file in turnover_files:
-        pharmacy_name, date_str = extract_pharmacy_and_date(str(pdf_file))
-        turnover_data = extract_turnover_summary_data(str(pdf_file))
-        
-        complete_data = {
-            'file': pdf_file.name,
-            'pharmacy': pharmacy_name,
-            'date': date_str,
-            **turnover_data
-        }
-        all_data.append(complete_data)
-    
+        key = extract_cache.file_key(pdf_file)
+        if key in cache:
+            fresh_cache[key] = cache[key]
+            all_data.append(cache[key])
+        else:
+            to_process.append((key, pdf_file))
+
+    if to_process:
+        # Each PDF is independent, so fan the extraction out across cores;
+        # PyMuPDF parsing dominates and parallelizes cleanly in processes
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+            results = list(executor.map(
+                _process_one, (str(p) for _, p in to_process), chunksize=4))
+        for (key, _), result in zip(to_process, results):
+            fresh_cache[key] = result
+            all_data.append(result)
+
+    # Persist only keys seen this run so stale entries age out
+    extract_cache.save_cache(cache_path, fresh_cache)
+
     # Save extracted data to JSON file for the pipeline
     output_file = Path("turnover_summary_extracted_data.json")
-    with open(output_file, 'w') as f:
-        json.dump(all_data, f, indent=2, default=str)
+    dump_json(output_file, all_data)
 
 if __name__ == "__main__":
     process_all_turnover_summaries() 
\ No newline at end of file
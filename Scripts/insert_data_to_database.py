@@ -22,8 +22,10 @@ def insert_data_to_database():
         data = json.load(f)
     
     print(f"📊 Found {len(data)} pharmacy/date combinations to insert")
-    
-    success_count = 0
+
+    # Build all rows first, then insert them in one bulk statement below -
+    # one round-trip per ~200 rows instead of one per record
+    rows = []
     for key, pharmacy_data in data.items():
         try:
             # Extract pharmacy and date
@@ -110,28 +112,28 @@ def insert_data_to_database():
                 if total_qty and insert_data['transactions_total']:
                     insert_data['avg_basket_size'] = total_qty / insert_data['transactions_total']
             
-            # Insert the data
-            if db.insert_daily_summary(**insert_data):
-                success_count += 1
-                print(f"✅ Successfully inserted data for {pharmacy} - {date}")
-                # Refresh pre-aggregations (MTD/YTD)
-                try:
-                    db.refresh_rollups(pharmacy, date)
-                    print("   ♻️  Rollups refreshed")
-                except Exception as e:
-                    print(f"   ⚠️  Rollup refresh skipped/failed: {e}")
-                
-                # Print summary of inserted data
-                print(f"   💰 Turnover: R{insert_data['turnover']:,.2f}" if insert_data['turnover'] else "   💰 Turnover: N/A")
-                print(f"   🛒 Transactions: {insert_data['transactions_total']}" if insert_data['transactions_total'] else "   🛒 Transactions: N/A")
-                print(f"   💊 Scripts: {insert_data['script_total']}" if insert_data['script_total'] else "   💊 Scripts: N/A")
-            else:
-                print(f"❌ Failed to insert data for {pharmacy} - {date}")
-        
+            rows.append(insert_data)
+
+            # Print summary of prepared data
+            print(f"   💰 Turnover: R{insert_data['turnover']:,.2f}" if insert_data['turnover'] else "   💰 Turnover: N/A")
+            print(f"   🛒 Transactions: {insert_data['transactions_total']}" if insert_data['transactions_total'] else "   🛒 Transactions: N/A")
+            print(f"   💊 Scripts: {insert_data['script_total']}" if insert_data['script_total'] else "   💊 Scripts: N/A")
+
         except Exception as e:
             print(f"❌ Error processing {key}: {e}")
             continue
-    
+
+    # Single bulk upsert for all prepared rows
+    success_count = db.insert_daily_summary_bulk(rows)
+    if success_count:
+        print(f"\n✅ Bulk-inserted {success_count} records in one statement")
+        # Refresh pre-aggregations (MTD/YTD) per affected pharmacy/date
+        for row in rows:
+            try:
+                db.refresh_rollups(row['pharmacy_code'], row['report_date'])
+            except Exception as e:
+                print(f"   ⚠️  Rollup refresh skipped/failed for {row['pharmacy_code']} - {row['report_date']}: {e}")
+
     print(f"\n🎉 Database insertion completed!")
     print(f"✅ Successfully inserted {success_count}/{len(data)} records")
     
@@ -9,7 +9,7 @@ deployed on Render with PostgreSQL.
 
 import os
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 from typing import Dict, List, Any, Optional
 from datetime import datetime, date
 
@@ -132,7 +132,73 @@ class RenderPharmacyDatabase:
         except Exception as e:
             print(f"❌ Failed to insert daily summary: {e}")
             return False
-    
+
+    # Column order shared by insert_daily_summary and the bulk variant
+    _DAILY_SUMMARY_FIELDS = (
+        'pharmacy_code', 'report_date', 'turnover', 'gp_percent', 'gp_value',
+        'cost_of_sales', 'purchases', 'avg_basket_value', 'avg_basket_size',
+        'transactions_total', 'script_total', 'avg_script_value', 'disp_turnover',
+        'stock_opening', 'stock_closing', 'adjustments', 'sales_cash',
+        'sales_cod', 'sales_account', 'type_r_sales'
+    )
+
+    def insert_daily_summary_bulk(self, rows: List[Dict]) -> int:
+        """Insert or update many daily summary rows in one statement.
+
+        Uses psycopg2's execute_values so N rows cost ~N/200 round-trips
+        instead of N. Returns the number of rows submitted, or 0 on error.
+        """
+        if not rows:
+            return 0
+
+        query = """
+        INSERT INTO daily_summary (
+            pharmacy_id, report_date, turnover, gp_percent, gp_value,
+            cost_of_sales, purchases, avg_basket_value, avg_basket_size,
+            transactions_total, script_total, avg_script_value, disp_turnover,
+            stock_opening, stock_closing, adjustments, sales_cash,
+            sales_cod, sales_account, type_r_sales
+        ) VALUES %s
+        ON CONFLICT (pharmacy_id, report_date) DO UPDATE SET
+            turnover = EXCLUDED.turnover,
+            gp_percent = EXCLUDED.gp_percent,
+            gp_value = EXCLUDED.gp_value,
+            cost_of_sales = EXCLUDED.cost_of_sales,
+            purchases = EXCLUDED.purchases,
+            avg_basket_value = EXCLUDED.avg_basket_value,
+            avg_basket_size = EXCLUDED.avg_basket_size,
+            transactions_total = EXCLUDED.transactions_total,
+            script_total = EXCLUDED.script_total,
+            avg_script_value = EXCLUDED.avg_script_value,
+            disp_turnover = EXCLUDED.disp_turnover,
+            stock_opening = EXCLUDED.stock_opening,
+            stock_closing = EXCLUDED.stock_closing,
+            adjustments = EXCLUDED.adjustments,
+            sales_cash = EXCLUDED.sales_cash,
+            sales_cod = EXCLUDED.sales_cod,
+            sales_account = EXCLUDED.sales_account,
+            type_r_sales = EXCLUDED.type_r_sales
+        """
+        template = (
+            "((SELECT id FROM pharmacies WHERE pharmacy_code = %s), "
+            "%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+        )
+
+        values = [
+            tuple(row.get(field) for field in self._DAILY_SUMMARY_FIELDS)
+            for row in rows
+        ]
+
+        try:
+            with self.conn.cursor() as cursor:
+                execute_values(cursor, query, values, template=template, page_size=200)
+            self.conn.commit()
+            return len(values)
+        except Exception as e:
+            self.conn.rollback()
+            print(f"❌ Failed to bulk insert daily summaries: {e}")
+            return 0
+
     def insert_sales_details(self, pharmacy_code: str, report_date: str, sales_data: List[Dict]) -> bool:
         """Insert sales details data"""
         if not sales_data:
@@ -0,0 +1,169 @@
+"""
+Shared helpers for the PDF summary extractors.
+
+The transaction and turnover extractors carried identical copies of the
+pharmacy detection, date parsing/fallback and currency-formatting code;
+keeping one copy here means fixes and optimizations land in both at
+once.
+"""
+
+import functools
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+# C-accelerated JSON encoding when available; stdlib json remains the
+# fallback so the dependency stays optional
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# PDFium extracts plain text noticeably faster than PyMuPDF for the
+# regex-only work these reports need; use it when installed and keep
+# PyMuPDF as the fallback so the dependency stays optional
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
+
+def page_texts(pdf_path: str):
+    """Yield plain text per page, preferring the faster PDFium backend"""
+    if pdfium is not None:
+        pdf = pdfium.PdfDocument(pdf_path)
+        try:
+            for page in pdf:
+                textpage = page.get_textpage()
+                # PDFium emits \r\n line endings; normalize so the
+                # $-anchored line patterns downstream match both backends
+                yield textpage.get_text_range().replace('\r\n', '\n')
+                textpage.close()
+                page.close()
+        finally:
+            pdf.close()
+    else:
+        with fitz.open(pdf_path) as doc:
+            for page in doc:
+                yield page.get_text("text", sort=False)
+
+
+def dump_json(path: Path, data: Any) -> None:
+    """Write data as indented JSON, preferring the faster orjson encoder"""
+    if orjson is not None:
+        Path(path).write_bytes(orjson.dumps(data, default=str, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2, default=str)
+
+# Pharmacy markers as one case-insensitive alternation: a single scan
+# over the first page replaces one substring pass per marker. The dict
+# maps the matched marker to the canonical pharmacy name
+_PHARMACY_RE = re.compile(r'REITZ|WINTERTON|TLC', re.IGNORECASE)
+_PHARMACY_NAMES = {
+    'REITZ': 'REITZ',
+    'WINTERTON': 'TLC WINTERTON',
+    'TLC': 'TLC WINTERTON',
+}
+
+# Report date range as one pattern: the first branch covers the
+# FROM:/TO: label variants (with or without a DATE prefix - the old
+# RANGE.../PERIOD... variants were redundant prefixes of it under
+# search), the second covers the bare YYYY/M/D - YYYY/M/D form. One
+# search replaces up to five sequential pattern attempts per file.
+DATE_RANGE_RE = re.compile(
+    r'(?:DATE\s+FROM|FROM)\s*:\s*(\d{4})/(\d{1,2})/(\d{1,2})\s+'
+    r'(?:DATE\s+TO|TO)\s*:\s*(\d{4})/(\d{1,2})/(\d{1,2})'
+    r'|(\d{4})/(\d{1,2})/(\d{1,2})\s*-\s*(\d{4})/(\d{1,2})/(\d{1,2})',
+    re.IGNORECASE
+)
+
+# Fallback date sources: classifier folder name and YYYYMMDD in filename
+_FOLDER_DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
+_FILENAME_DATE_RE = re.compile(r"(20\d{6})")
+
+
+@functools.lru_cache(maxsize=4096)
+def _first_page_text_cached(pdf_path: str, mtime_ns: int) -> str:
+    with fitz.open(pdf_path) as doc:
+        return doc.load_page(0).get_text("text", sort=False)
+
+
+def first_page_text(pdf_path: str) -> str:
+    """First page's plain text, memoized per (path, mtime)
+
+    One cache serves every extractor in the process, so a PDF whose
+    pharmacy/date has been sniffed once is never re-opened for it; the
+    mtime in the key invalidates the entry when a file is replaced.
+    """
+    return _first_page_text_cached(pdf_path, os.stat(pdf_path).st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=None)
+def list_reports(base_dir: str, prefix: str) -> Tuple[Path, ...]:
+    """Classified report PDFs under base_dir whose names start with prefix
+
+    One walk serves every (base_dir, prefix) pair for the life of the
+    process, so repeated lookups don't re-traverse the tree with a stat
+    per file. Callers that need to see files added mid-process should
+    call list_reports.cache_clear() first.
+    """
+    return tuple(
+        p for p in Path(base_dir).rglob("*.pdf") if p.name.startswith(prefix)
+    )
+
+
+def detect_pharmacy(text: str) -> str:
+    """Canonical pharmacy name found in report text, or UNKNOWN"""
+    m = _PHARMACY_RE.search(text)
+    return _PHARMACY_NAMES[m.group(0).upper()] if m else "UNKNOWN"
+
+
+def parse_end_date(text: str, patterns=(DATE_RANGE_RE,)) -> Optional[str]:
+    """ISO end date from the first date-range pattern that matches
+
+    Handles alternation patterns whose unmatched branch leaves None
+    groups, full-range patterns (six groups) and single-date patterns.
+    """
+    for pattern in patterns:
+        match = pattern.search(text)
+        if match:
+            groups = [g for g in match.groups() if g is not None]
+            # Use the end date (last 3 values) when a full range matched
+            if len(groups) >= 6:
+                year, month, day = groups[3], groups[4], groups[5]
+            else:
+                year, month, day = groups[0], groups[1], groups[2]
+            return f"{year}-{month.zfill(2)}-{day.zfill(2)}"
+    return None
+
+
+def fallback_date(pdf_path: str) -> Optional[str]:
+    """Date from the classifier folder name or a YYYYMMDD filename stamp"""
+    try:
+        # Fallback 1 ─ pick the <date> folder two levels up created by classifier
+        possible_date = Path(pdf_path).parent.parent.name  # e.g. 2025-08-05
+        if _FOLDER_DATE_RE.match(possible_date):
+            return possible_date
+    except Exception:
+        pass
+    # Fallback 2 ─ look for YYYYMMDD inside the filename
+    m = _FILENAME_DATE_RE.search(Path(pdf_path).name)
+    if m:
+        raw = m.group(1)            # 20250805
+        return f"{raw[:4]}-{raw[4:6]}-{raw[6:8]}"
+    return None
+
+
+def format_currency(amount: float) -> str:
+    """Format amount as currency with commas"""
+    if amount is None:
+        return "N/A"
+    elif amount < 0:
+        return f"-R{abs(amount):,.2f}"
+    else:
+        return f"R{amount:,.2f}"